@@ -0,0 +1,126 @@
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Script that renders one job (each job runs in its own process with its own offscreen pipeline)
+render_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Rotate_shape.py")
+
+# Defaults for anything a job does not set
+job_defaults = {"width": 800, "height": 600, "fps": 30, "duration": 10.0}
+
+# Function to load a job manifest: a JSON list of jobs, or a CSV file with one job per row
+def load_manifest(path):
+    if path.endswith(".csv"):
+        jobs = []
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                job = {key: value for key, value in row.items() if value not in (None, "")}
+                if "images" in job:
+                    job["images"] = job["images"].split(";")  # e.g. "a.jpg;b.jpg"
+                if "background" in job:
+                    job["background"] = [float(c) for c in job["background"].split()]  # e.g. "0.1 0.2 0.4"
+                jobs.append(job)
+    else:
+        with open(path) as f:
+            jobs = json.load(f)
+
+    for i, job in enumerate(jobs):
+        job.setdefault("name", f"job_{i:04d}")
+        for key, value in job_defaults.items():
+            job.setdefault(key, value)
+        if "encoder" not in job:
+            job.setdefault("output", os.path.join(job["name"], "frame_%05d.png"))
+    return jobs
+
+# Function to build the command line for one job
+def job_command(job):
+    command = [sys.executable, render_script, "--headless",
+               "--width", str(job["width"]), "--height", str(job["height"]),
+               "--fps", str(job["fps"]), "--duration", str(job["duration"])]
+    if "encoder" in job:
+        command += ["--encoder", job["encoder"]]
+    else:
+        command += ["--output", job["output"]]
+    if "images" in job:
+        command += ["--images", *job["images"]]
+    if "background" in job:
+        command += ["--background", *[str(c) for c in job["background"]]]
+    return command
+
+# Function to render one job in a separate process, so a crash only fails that job. A job that cannot start,
+# or runs longer than its "timeout" in seconds (default_timeout if not set), fails instead of raising.
+def run_job(job, default_timeout=None):
+    # Keep Mesa's software rasterizer to one thread per job, the pool already uses every core
+    env = dict(os.environ)
+    env.setdefault("LP_NUM_THREADS", "1")
+    start = time.perf_counter()
+    timeout = default_timeout
+    try:
+        timeout = float(job["timeout"]) if "timeout" in job else default_timeout
+        result = subprocess.run(job_command(job), capture_output=True, cwd=job.get("cwd"), env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"name": job["name"], "ok": False, "elapsed": time.perf_counter() - start, "frames": 0,
+                "error": f"timed out after {timeout:g} s"}
+    except Exception as e:  # e.g. a missing cwd or a malformed job, which fails only this job
+        return {"name": job["name"], "ok": False, "elapsed": time.perf_counter() - start, "frames": 0,
+                "error": str(e)}
+    elapsed = time.perf_counter() - start
+
+    # Encoders may write anything to the job's output, so decode leniently
+    stdout = result.stdout.decode(errors="replace")
+    stderr = result.stderr.decode(errors="replace")
+    match = re.search(r"Rendered (\d+) frames .*\(([\d.]+) frames/s\)", stdout)
+    if result.returncode != 0 or match is None:
+        error = stderr.strip().splitlines()[-1:] or [f"exit code {result.returncode}"]
+        return {"name": job["name"], "ok": False, "elapsed": elapsed, "frames": 0, "error": error[0]}
+
+    return {"name": job["name"], "ok": True, "elapsed": elapsed, "frames": int(match.group(1)),
+            "fps": float(match.group(2))}
+
+# Function to run all jobs across a pool of worker processes and print a throughput summary
+def run_batch(jobs, workers=None, timeout=None):
+    workers = workers or os.cpu_count() or 1
+    print(f"Rendering {len(jobs)} jobs with {workers} workers")
+
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job, timeout) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            if result["ok"]:
+                print(f"[{done}/{len(jobs)}] {result['name']}: {result['frames']} frames in "
+                      f"{result['elapsed']:.1f} s ({result['fps']:.1f} frames/s)")
+            else:
+                print(f"[{done}/{len(jobs)}] {result['name']}: FAILED after {result['elapsed']:.1f} s: "
+                      f"{result['error']}")
+    elapsed = time.perf_counter() - start
+
+    failed = [result["name"] for result in results if not result["ok"]]
+    total_frames = sum(result["frames"] for result in results)
+    busy_time = sum(result["elapsed"] for result in results)
+    print(f"Finished {len(jobs) - len(failed)}/{len(jobs)} jobs in {elapsed:.1f} s")
+    print(f"Throughput: {total_frames / elapsed:.1f} frames/s, {len(jobs) / elapsed * 60:.1f} jobs/min, "
+          f"speedup over serial: {busy_time / elapsed:.1f}x")
+    if failed:
+        print(f"Failed jobs: {', '.join(failed)}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render many spinning cube animations in parallel")
+    parser.add_argument("manifest", help="JSON or CSV job manifest")
+    parser.add_argument("--workers", type=int, help="number of parallel renders (default: CPU count)")
+    parser.add_argument("--timeout", type=float,
+                        help="seconds after which a job fails (a job's own \"timeout\" takes precedence)")
+    args = parser.parse_args()
+
+    results = run_batch(load_manifest(args.manifest), args.workers, args.timeout)
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
@@ -0,0 +1,327 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import vtk
+
+from Rotate_shape import (CubeScene, SessionRecorder, SessionReplay, SoftwareRenderer, SpinningCube,
+                          clear_texture_cache, create_textured_face, cube_faces, get_cached_texture, images_to_cycle,
+                          numpy, render_tiled, simulation_step_ms, texture_cache)
+
+# Results of a known good run on this machine; a run is compared against it when it exists
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# A metric more than this fraction worse than the baseline counts as a regression
+default_tolerance = 0.25
+
+# Window sizes and cube counts for the steady-state frame rate runs
+fps_sizes = [(320, 240), (800, 600), (1920, 1080)]
+fps_cube_counts = [1, 9, 25]
+
+
+# Function to create an offscreen scene with a grid of cubes
+def offscreen_scene(width, height, count, images):
+    scene = CubeScene(width, height)
+    scene.render_window.SetOffScreenRendering(1)
+    side = max(1, round(count ** 0.5))
+    for i in range(count):
+        row, column = divmod(i, side)
+        scene.add_cube(SpinningCube(images, ((column - (side - 1) / 2) * 2.0, (row - (side - 1) / 2) * 2.0, 0.0)))
+    if not any(cube.actors for cube in scene.cubes):
+        sys.exit("No cube faces could be loaded")  # Timing an empty scene would pass any baseline
+    scene.render_window.Render()  # The first frame compiles shaders and uploads textures
+    return scene
+
+# Function to release a scene's graphics resources before the next one is created
+def close_scene(scene):
+    # Cached textures that were swapped off the cubes still hold resources in this window
+    for texture, _ in texture_cache.values():
+        texture.ReleaseGraphicsResources(scene.render_window)
+    scene.render_window.Finalize()
+
+# Function to measure building the six faces of a cube, with textures cached and with the memory cache empty
+def bench_construction(images, repeat):
+    def build_faces():
+        return [create_textured_face(images[0], face["origin"], face["point1"], face["point2"])
+                for face in cube_faces]
+
+    cold = []
+    for _ in range(repeat):
+        clear_texture_cache()  # Processed images still come from the disk cache, as on a normal start
+        start = time.perf_counter()
+        build_faces()
+        cold.append(time.perf_counter() - start)
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build_faces()
+        warm.append(time.perf_counter() - start)
+
+    return {"construct_ms": (statistics.median(warm) * 1000, "ms"),
+            "construct_cold_ms": (statistics.median(cold) * 1000, "ms")}
+
+# Function to measure the cost of one rotate_cube() call
+def bench_rotate(images, ticks):
+    cube = SpinningCube(images)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        cube.rotate_cube()
+    return {"rotate_cube_us": ((time.perf_counter() - start) / ticks * 1e6, "us")}
+
+# Function to measure update_textures() and how much longer a frame with a swap takes than a normal frame
+def bench_swap(images, repeat, width=800, height=600):
+    scene = offscreen_scene(width, height, 1, images)
+    cube = scene.cubes[0]
+    for image_path in images:
+        get_cached_texture(image_path)  # Steady state: every image is decoded already
+
+    updates, swap_frames, frames = [], [], []
+    for _ in range(repeat):
+        cube.rotate_cube()
+        start = time.perf_counter()
+        scene.render_window.Render()
+        frames.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cube.update_textures()
+        updated = time.perf_counter()
+        scene.render_window.Render()
+        updates.append(updated - start)
+        swap_frames.append(time.perf_counter() - start)
+    close_scene(scene)
+
+    return {"update_textures_ms": (statistics.median(updates) * 1000, "ms"),
+            "frame_ms": (statistics.median(frames) * 1000, "ms"),
+            "swap_frame_ms": (statistics.median(swap_frames) * 1000, "ms")}
+
+# Function to measure the steady-state frame rate at each window size and cube count
+def bench_fps(images, frames, sizes=fps_sizes, counts=fps_cube_counts):
+    steps_per_frame = max(1, round(1000 / simulation_step_ms / 60))  # Animation speed of a 60 Hz display
+    results = {}
+    for width, height in sizes:
+        for count in counts:
+            scene = offscreen_scene(width, height, count, images)
+            start = time.perf_counter()
+            for _ in range(frames):
+                scene.advance(steps_per_frame)
+                scene.render_window.Render()
+            results[f"fps_{width}x{height}_{count}_cubes"] = (frames / (time.perf_counter() - start), "fps")
+            close_scene(scene)
+    return results
+
+# Function to measure headless frames per second with each backend, including getting the pixels back
+def bench_headless(images, frames, width=800, height=600):
+    steps_per_frame = max(1, round(1000 / simulation_step_ms / 30))
+    results = {}
+    scene = offscreen_scene(width, height, 1, images)
+    window_to_image = vtk.vtkWindowToImageFilter()
+    window_to_image.SetInput(scene.render_window)
+    window_to_image.SetInputBufferTypeToRGB()
+    window_to_image.ReadFrontBufferOff()
+    window_to_image.ShouldRerenderOff()  # Time one render and one readback per frame, not two renders
+    start = time.perf_counter()
+    for _ in range(frames):
+        scene.advance(steps_per_frame)
+        scene.render_window.Render()
+        window_to_image.Modified()
+        window_to_image.Update()
+    results[f"headless_vtk_{width}x{height}_fps"] = (frames / (time.perf_counter() - start), "fps")
+
+    if numpy is not None:
+        software = SoftwareRenderer(scene)
+        software.render()  # Converts the textures once
+        start = time.perf_counter()
+        for _ in range(frames):
+            scene.advance(steps_per_frame)
+            software.render()
+        results[f"headless_numpy_{width}x{height}_fps"] = (frames / (time.perf_counter() - start), "fps")
+    close_scene(scene)
+    return results
+
+# Function to measure a large still rendered in tiles with one worker process and with one per core, and count
+# the pixels where the NumPy backend's tiles differ from the same still rendered as one tile
+def bench_tiled(images, width=3200, height=1800, tile_size=512):
+    settings = {"images": images, "grid": 2}
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        tiled_path = os.path.join(directory, "tiled.ppm")
+        for backend in ["vtk", "numpy"] if numpy is not None else ["vtk"]:
+            for workers in sorted({1, os.cpu_count() or 1}):
+                seconds = render_tiled(settings, tiled_path, width, height, tile_size, workers, backend=backend)
+                results[f"tiled_{backend}_{width}x{height}_{workers}_workers_s"] = (seconds, "s")
+        if numpy is not None:
+            whole_path = os.path.join(directory, "whole.ppm")
+            render_tiled(settings, whole_path, width, height, max(width, height), 1, backend="numpy")
+            tiled = numpy.fromfile(tiled_path, dtype=numpy.uint8)
+            whole = numpy.fromfile(whole_path, dtype=numpy.uint8)
+            mismatched = (tiled != whole)[-width * height * 3:].reshape(-1, 3).any(axis=1).sum()
+            results["tiled_numpy_mismatched_px"] = (int(mismatched), "px")
+    return results
+
+# Function to measure the time from start-up to the first frame and to every texture being on screen, with
+# textures decoded before the first frame and with --fast-start. Each run is a fresh process so imports count.
+def bench_startup(images, repeat=5):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Rotate_shape.py")
+    results = {}
+    for label, options in [("blocking", []), ("fast", ["--fast-start"])]:
+        first_frames, textured = [], []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, script, "--startup-only", "--headless", "--images", *images]
+                                    + options, capture_output=True, text=True, check=True).stdout
+            times = json.loads(output.strip().splitlines()[-1])
+            first_frames.append(times["first_frame_ms"])
+            textured.append(times["textures_ms"])
+        results[f"startup_{label}_first_frame_ms"] = (statistics.median(first_frames), "ms")
+        results[f"startup_{label}_textures_ms"] = (statistics.median(textured), "ms")
+    return results
+
+# Stands in for the interactor so a session can be driven through CubeScene.timer_callback() without a window
+class TickDriver:
+    def __init__(self):
+        self.timer_id = 0
+
+    # Function to start the next timer, which fires when tick() is called
+    def CreateOneShotTimer(self, interval):
+        self.timer_id += 1
+        return self.timer_id
+
+    # Function to return the id of the timer that fired
+    def GetTimerEventId(self):
+        return self.timer_id
+
+    # Function to fire the timer once
+    def tick(self, scene):
+        scene.timer_callback(self, "TimerEvent")
+
+# Function to return the pixels of the frame a scene last rendered
+def frame_pixels(scene):
+    width, height = scene.render_window.GetSize()
+    data = vtk.vtkUnsignedCharArray()
+    scene.render_window.GetPixelData(0, 0, width - 1, height - 1, 0, data, 0)
+    return bytes(memoryview(data))
+
+# Function to record a session whose images are changed by command, once to an image already decoded and once
+# to one that is not, replay it in a new scene and count the swaps and moves, and the pixels of the last frame,
+# that differ from the recording
+def bench_replay(images, ticks=60, width=320, height=240):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.log")
+        scene = offscreen_scene(width, height, 1, images[:1])
+        recorder = SessionRecorder(scene, path)
+        driver = TickDriver()
+        scene.timer_id = driver.CreateOneShotTimer(0)
+        tick = 0
+        while tick < ticks or scene.rebuilding_cubes:
+            if tick == ticks // 3:
+                scene.commands.put([{"cmd": "images", "images": images[:2]}])
+            elif tick == ticks * 2 // 3:
+                scene.commands.put([{"cmd": "images", "images": images[-1:] + images[:1]}])  # Not prefetched
+            driver.tick(scene)
+            time.sleep(simulation_step_ms / 1000)
+            tick += 1
+        recorder.close()
+        scene.render_window.Render()
+        recorded = frame_pixels(scene)
+        close_scene(scene)
+        clear_texture_cache()  # The replay decodes its images again, as in a new process
+
+        scene = offscreen_scene(width, height, 1, images[:1])
+        replay = SessionReplay(scene, path)
+        replay.run()
+        scene.render_window.Render()
+        replayed = frame_pixels(scene)
+        close_scene(scene)
+    mismatched = sum(recorded[i:i + 3] != replayed[i:i + 3] for i in range(0, len(recorded), 3))
+    return {"replay_mismatched_changes": (replay.mismatches, "changes"), "replay_mismatched_px": (mismatched, "px")}
+
+# Function to run every benchmark and return the results as a JSON-ready dict
+def run_benchmarks(images, repeat=20, ticks=100000, frames=100):
+    metrics = {}
+    with contextlib.redirect_stdout(io.StringIO()):  # update_textures() prints every swap
+        metrics.update(bench_construction(images, repeat))
+        metrics.update(bench_rotate(images, ticks))
+        metrics.update(bench_swap(images, repeat))
+        metrics.update(bench_fps(images, frames))
+        metrics.update(bench_headless(images, frames))
+        metrics.update(bench_tiled(images))
+        metrics.update(bench_startup(images))
+        metrics.update(bench_replay(images))
+    return {
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "vtk": vtk.vtkVersion.GetVTKVersion(), "processor": platform.processor()},
+        "metrics": {name: {"value": round(value, 4), "unit": unit} for name, (value, unit) in metrics.items()},
+    }
+
+# Function to compare results with a baseline, returns the names of the metrics that regressed
+def compare(results, baseline, tolerance=default_tolerance):
+    if results["machine"] != baseline["machine"]:
+        print("Note: the baseline was recorded on a different machine or VTK version")
+
+    regressions = []
+    print(f"{'metric':<32} {'value':>10} {'baseline':>10} {'change':>8}")
+    for name, metric in results["metrics"].items():
+        value = metric["value"]
+        base = baseline["metrics"].get(name, {}).get("value")
+        if not base:
+            print(f"{name:<32} {value:>10.3f} {'-':>10} {'':>8}")
+            continue
+
+        change = value / base - 1
+        # Frame rates should go up, everything else is a time and should go down
+        worse = -change if metric["unit"] == "fps" else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32} {value:>10.3f} {base:>10.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offscreen benchmarks of cube construction, ticks, swaps and FPS")
+    parser.add_argument("--images", nargs="+", help="images to use instead of the built-in list")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--baseline", default=default_baseline, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=default_tolerance,
+                        help="fraction a metric may get worse before it counts as a regression")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each timed step (the median is kept)")
+    parser.add_argument("--frames", type=int, default=100, help="frames per frame rate run")
+    args = parser.parse_args()
+
+    images = args.images or images_to_cycle
+    missing = [image for image in images if not os.path.exists(image)]
+    if missing:
+        sys.exit(f"Images not found: {', '.join(missing)} (pass images that exist with --images)")
+
+    results = run_benchmarks(images, repeat=args.repeat, frames=args.frames)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+    if results["metrics"].get("tiled_numpy_mismatched_px", {}).get("value"):
+        sys.exit("The NumPy backend's tiles do not match the same image rendered whole")
+    if any(results["metrics"][name]["value"] for name in ["replay_mismatched_changes", "replay_mismatched_px"]):
+        sys.exit("Replaying a session does not reproduce it")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(f"{len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+    else:
+        for name, metric in results["metrics"].items():
+            print(f"{name:<32} {metric['value']:>10.3f} {metric['unit']}")
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one")
@@ -0,0 +1,105 @@
+import argparse
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+
+from Rotate_shape import ControlServer, CubeScene, SpinningCube
+
+
+# Function to connect to a control server at "HOST:PORT" or "unix:PATH"
+def connect(address):
+    if address.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[5:])
+    else:
+        host, port = address.rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+# Function to send lines of JSON commands and return the server's replies
+def send_lines(address, lines):
+    with connect(address) as sock:
+        replies = sock.makefile("rb")
+        sock.sendall(b"".join(line.encode() + b"\n" for line in lines))
+        return [json.loads(replies.readline()) for _ in lines]
+
+# Function to flood an in-process scene with translate commands while it renders, and check every one arrived.
+# Commands are pipelined, batch_size per line; returns the commands per second the server accepted.
+def throughput_test(count=20000, batch_size=1, width=200, height=200, images=None):
+    scene = CubeScene(width, height)
+    scene.render_window.SetOffScreenRendering(1)
+    cube = scene.add_cube(SpinningCube(images))
+    if not cube.actors:
+        sys.exit("No cube faces could be loaded")  # Timing commands against an empty scene would pass any rate
+    server = ControlServer(scene, "127.0.0.1:0").start()
+    step = 0.001
+    command = {"cmd": "translate", "by": [step, 0.0, 0.0]}
+    lines = [json.dumps([command] * batch_size if batch_size > 1 else command)
+             for _ in range(count // batch_size)]
+    count = len(lines) * max(1, batch_size)
+
+    # The client writes every line and reads the acknowledgements on its own thread
+    acknowledged = []
+    def client():
+        with connect(server.bound_address) as sock:
+            replies = sock.makefile("rb")
+            sender = threading.Thread(target=sock.sendall,
+                                      args=(b"".join(line.encode() + b"\n" for line in lines),))
+            start = time.perf_counter()
+            sender.start()
+            queued = sum(json.loads(replies.readline())["queued"] for _ in lines)
+            acknowledged.append((queued, time.perf_counter() - start))
+            sender.join()
+
+    start_x = cube.translation[0]
+    client_thread = threading.Thread(target=client)
+    client_thread.start()
+
+    # Render thread: apply whatever has arrived, advance and render, as the interactive loop does
+    applied = 0
+    apply_times, frame_times = [], []
+    start = time.perf_counter()
+    while applied < count and time.perf_counter() - start < 60:
+        frame_start = time.perf_counter()
+        applied += scene.apply_commands()
+        apply_times.append(time.perf_counter() - frame_start)
+        scene.advance(1)
+        scene.render_window.Render()
+        frame_times.append(time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - start
+    client_thread.join()
+    server.close()
+
+    queued, send_time = acknowledged[0] if acknowledged else (0, float("nan"))
+    moved = cube.translation[0] - start_x
+    print(f"{count} commands in lines of {batch_size}: server accepted {queued / send_time:.0f} commands/s, "
+          f"render thread applied {applied} in {elapsed:.2f} s over {len(frame_times)} frames")
+    print(f"  apply per frame: median {statistics.median(apply_times) * 1000:.3f} ms, "
+          f"max {max(apply_times) * 1000:.3f} ms; frame: median {statistics.median(frame_times) * 1000:.2f} ms")
+    if applied != count or abs(moved - count * step) > 1e-6 * count:
+        sys.exit(f"Only {applied} of {count} commands were applied (moved {moved:.4f}, expected {count * step:.4f})")
+    return queued / send_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send JSON-lines commands to a cube control server")
+    parser.add_argument("address", nargs="?", default="127.0.0.1:8765", help="HOST:PORT or unix:PATH")
+    parser.add_argument("commands", nargs="*", help='one JSON command or list per line, e.g. \'{"cmd": "pause"}\'')
+    parser.add_argument("--throughput", type=int, metavar="N",
+                        help="flood an in-process scene with N commands and check they are all applied")
+    parser.add_argument("--batch", type=int, default=1, help="commands per line in the throughput test")
+    parser.add_argument("--images", nargs="+", help="images to show in the throughput test instead of the built-in list")
+    parser.add_argument("--min-rate", type=float, default=1000, help="commands/s the throughput test must reach")
+    args = parser.parse_args()
+
+    if args.throughput:
+        rate = throughput_test(args.throughput, args.batch, images=args.images)
+        if rate < args.min_rate:
+            sys.exit(f"Throughput {rate:.0f} commands/s is below {args.min_rate:.0f}")
+    else:
+        for reply in send_lines(args.address, args.commands or sys.stdin.read().splitlines()):
+            print(json.dumps(reply))
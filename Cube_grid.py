@@ -0,0 +1,197 @@
+import argparse
+import math
+import time
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from Rotate_shape import (CubeScene, build_texture_atlas, create_atlas_cube, cube_faces, images_to_cycle,
+                          simulation_step_ms)
+
+
+# Function to turn arrays of quaternions and translations into 4x4 matrices in one step
+def quaternions_to_matrices(quaternions, translations):
+    w, x, y, z = quaternions[:, 0], quaternions[:, 1], quaternions[:, 2], quaternions[:, 3]
+    matrices = np.zeros((len(quaternions), 4, 4))
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - z * w)
+    matrices[:, 0, 2] = 2 * (x * z + y * w)
+    matrices[:, 1, 0] = 2 * (x * y + z * w)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - x * w)
+    matrices[:, 2, 0] = 2 * (x * z - y * w)
+    matrices[:, 2, 1] = 2 * (y * z + x * w)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    matrices[:, :3, 3] = translations
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+# Many cubes whose rotation state lives in NumPy arrays and is drawn with one instanced glyph mapper
+class CubeGrid:
+    def __init__(self, count, images=None, spacing=2.0, rates=None):
+        self.images_to_cycle = list(images or images_to_cycle)
+        self.current_image_index = 0
+        self.count = count
+        self.ticks = 0
+
+        # Lay the cubes out on a square grid in the XY plane, centred on the origin
+        side = math.ceil(math.sqrt(count))
+        rows, columns = np.divmod(np.arange(count), side)
+        offset = (side - 1) / 2
+        self.translations = np.zeros((count, 3), dtype=np.float32)
+        self.translations[:, 0] = (columns - offset) * spacing
+        self.translations[:, 1] = (rows - offset) * spacing
+
+        # Rotation angles in degrees and degrees per tick, one row per cube (x, y, z).
+        # float32 keeps the per-tick trigonometry on NumPy's SIMD paths.
+        self.angles = np.zeros((count, 3), dtype=np.float32)
+        self.rates = np.ones((count, 3), dtype=np.float32) if rates is None else np.asarray(rates, dtype=np.float32)
+        self.quaternions = np.zeros((count, 4), dtype=np.float32)
+
+        # The VTK arrays wrap the NumPy buffers, so a tick writes straight into what the mapper draws
+        self.points = vtk.vtkPoints()
+        self.points.SetData(numpy_support.numpy_to_vtk(self.translations, deep=False))
+        orientation = numpy_support.numpy_to_vtk(self.quaternions, deep=False)
+        orientation.SetName("Orientation")
+        self.centers = vtk.vtkPolyData()
+        self.centers.SetPoints(self.points)
+        self.centers.GetPointData().AddArray(orientation)
+
+        # One textured cube mesh is the glyph drawn at every point
+        faces = [dict(face, image=self.images_to_cycle[0]) for face in cube_faces]
+        cube = create_atlas_cube(faces)
+        if cube is None:
+            raise ValueError(f"Could not load {self.images_to_cycle[0]}, pass images that exist with --images")
+        self.faces = faces
+
+        self.mapper = vtk.vtkGlyph3DMapper()
+        self.mapper.SetInputData(self.centers)
+        self.mapper.SetSourceData(cube.GetMapper().GetInput())
+        self.mapper.ScalingOff()
+        self.mapper.SetOrientationModeToQuaternion()
+        self.mapper.SetOrientationArray("Orientation")
+        self.mapper.OrientOn()
+
+        self.actor = vtk.vtkActor()
+        self.actor.SetMapper(self.mapper)
+        self.actor.SetTexture(cube.GetTexture())
+        self.actors = [self.actor]
+        self.renderer = None
+
+        self.update_orientations()
+
+    # Function to add the grid's actor to a renderer
+    def add_to(self, renderer):
+        self.renderer = renderer
+        renderer.AddActor(self.actor)
+
+    # Function to remove the grid's actor from its renderer
+    def remove_from(self, renderer):
+        renderer.RemoveActor(self.actor)
+        self.renderer = None
+
+    # Function to compute every cube's orientation from its angles in one vectorized step
+    def update_orientations(self):
+        # Same order as SpinningCube.rotate_cube(): RotateX, then RotateY, then RotateZ.
+        # The product qx * qy * qz is written out so no temporary quaternion arrays are needed.
+        half = self.angles * np.float32(math.pi / 360)
+        cos, sin = np.cos(half), np.sin(half)
+        cx, cy, cz = cos[:, 0], cos[:, 1], cos[:, 2]
+        sx, sy, sz = sin[:, 0], sin[:, 1], sin[:, 2]
+        cxcy, sxsy, sxcy, cxsy = cx * cy, sx * sy, sx * cy, cx * sy
+        q = self.quaternions
+        np.subtract(cxcy * cz, sxsy * sz, out=q[:, 0])
+        np.add(sxcy * cz, cxsy * sz, out=q[:, 1])
+        np.subtract(cxsy * cz, sxcy * sz, out=q[:, 2])
+        np.add(cxcy * sz, sxsy * cz, out=q[:, 3])
+
+        self.centers.GetPointData().GetArray("Orientation").Modified()
+        self.points.Modified()
+        self.centers.Modified()
+
+    # Function to return every cube's 4x4 transform matrix
+    def matrices(self):
+        return quaternions_to_matrices(self.quaternions, self.translations)
+
+    # Function to advance every cube by one timer tick
+    def tick(self):
+        np.add(self.angles, self.rates, out=self.angles)
+        np.subtract(self.angles, 360, out=self.angles, where=self.angles >= 360)
+        np.add(self.angles, 360, out=self.angles, where=self.angles < 0)
+        self.update_orientations()
+
+        self.ticks += 1
+        if self.ticks % 360 == 0:  # Change texture every full rotation
+            self.update_textures()
+            return True
+        return False
+
+    # Function to give every cube the same rotation speed around each axis in degrees per second
+    def set_rotation_speed(self, x, y, z):
+        self.rates[:] = np.array([x, y, z], dtype=np.float32) * np.float32(simulation_step_ms / 1000)
+
+    # Function to update the texture shared by every cube in the grid
+    def update_textures(self):
+        self.current_image_index = (self.current_image_index + 1) % len(self.images_to_cycle)
+        new_image = self.images_to_cycle[self.current_image_index]
+
+        for face in self.faces:
+            face["image"] = new_image
+        texture, _ = build_texture_atlas([face["image"] for face in self.faces])
+        if texture is None:
+            return
+
+        self.actor.SetTexture(texture)
+        print(f"Updated grid textures to image: {new_image}")
+
+    # Function to move every cube in the grid
+    def translate(self, dx, dy, dz):
+        self.translations += (dx, dy, dz)
+        self.points.Modified()
+        self.centers.Modified()
+
+
+# Function to measure the per-tick cost of the grid at several cube counts
+def benchmark(counts=(1000, 10000, 100000), ticks=100, render=False, width=800, height=600, images=None):
+    print(f"{'cubes':>8} {'update ms/tick':>15} {'render ms/frame':>16}")
+    for count in counts:
+        # Random rates so the cubes are not all in lockstep
+        rates = np.random.default_rng(0).uniform(0.5, 2.0, (count, 3))
+        scene = CubeScene(width, height)
+        grid = scene.add_cube(CubeGrid(count, images, rates=rates))
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            grid.tick()
+        update_ms = (time.perf_counter() - start) / ticks * 1000
+
+        render_ms = float("nan")
+        if render:
+            scene.render_window.SetOffScreenRendering(1)
+            scene.render_window.Render()  # First frame uploads the geometry and texture
+            start = time.perf_counter()
+            for _ in range(ticks):
+                grid.tick()
+                scene.render_window.Render()
+            render_ms = (time.perf_counter() - start) / ticks * 1000
+
+        print(f"{count:>8} {update_ms:>15.3f} {render_ms:>16.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Large grid of spinning cubes drawn with instancing")
+    parser.add_argument("--count", type=int, default=1000, help="number of cubes")
+    parser.add_argument("--images", nargs="+", help="images to cycle through instead of the built-in list")
+    parser.add_argument("--benchmark", action="store_true", help="measure per-tick cost at 1k, 10k and 100k cubes")
+    parser.add_argument("--render", action="store_true", help="include offscreen render time in the benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(render=args.render, images=args.images)
+    else:
+        rates = np.random.default_rng().uniform(0.5, 2.0, (args.count, 3))
+        scene = CubeScene()
+        scene.add_cube(CubeGrid(args.count, args.images, rates=rates))
+        scene.start_render_loop()
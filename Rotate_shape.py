@@ -1,166 +1,3339 @@
+import argparse
+import atexit
+import bisect
+import csv
+import hashlib
+import json
+import math
+import mmap
+import multiprocessing
 import os
-import vtk
+import queue
+import shlex
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Start of the program, for the time to the first frame
+startup_time = time.perf_counter()
+
+# Only the VTK modules used here are imported, as "import vtk" loads all of them, which takes most of a second
+# before a window can open
+from vtkmodules.vtkCommonCore import VTK_UNSIGNED_CHAR, vtkFloatArray, vtkMath, vtkPoints, vtkUnsignedCharArray
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkImageData, vtkPolyData
+from vtkmodules.vtkCommonMath import vtkMatrix4x4
+from vtkmodules.vtkCommonTransforms import vtkTransform
+from vtkmodules.vtkFiltersCore import vtkImageAppend
+from vtkmodules.vtkFiltersSources import vtkPlaneSource
+from vtkmodules.vtkImagingCore import (vtkImageExtractComponents, vtkImageFlip, vtkImageInterpolator, vtkImageResize,
+                                       vtkImageShiftScale, vtkImageShrink3D)
+from vtkmodules.vtkIOImage import vtkImageReader2Factory, vtkJPEGWriter, vtkPNGWriter
+from vtkmodules.vtkRenderingCore import (vtkActor, vtkCamera, vtkPolyDataMapper, vtkRenderWindow,
+                                         vtkRenderWindowInteractor, vtkRenderer, vtkTextActor, vtkTexture,
+                                         vtkWindowToImageFilter)
+
+# These only register implementations of the rendering classes: OpenGL, the platform's window interactor
+# and its default style, and text
+import vtkmodules.vtkInteractionStyle
+import vtkmodules.vtkRenderingFreeType
+import vtkmodules.vtkRenderingOpenGL2
+try:
+    import vtkmodules.vtkRenderingUI
+except ImportError:  # Only in VTK 9.1 and later
+    pass
+
+try:
+    import numpy
+    from vtkmodules.util import numpy_support
+except ImportError:  # Without NumPy cached textures are copied instead of memory-mapped
+    numpy = None
+
+# Texture cache: one decoded image and one shared vtkTexture per (path, mtime)
+texture_cache = OrderedDict()  # (path, mtime[, lod]) or an atlas key -> (texture, size in bytes), oldest first
+atlas_regions = {}  # Texture cache key of an atlas -> each of its images' (u0, v0, u1, v1)
+texture_cache_bytes = 0
+texture_cache_max_bytes = 256 * 1024 * 1024  # Memory cap for decoded images (256 MB)
+
+# Background decoding of the next images in the cycle
+prefetch_executor = ThreadPoolExecutor(max_workers=1)
+prefetch_futures = {}  # (path, mtime) -> Future for the decoded vtkImageData
+prefetch_depth = 2  # How many upcoming images each cube decodes ahead
+
+# Image ingest: any format VTK can read, resampled to a power-of-two texture no larger than this
+image_extensions = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+max_texture_size = 1024
+
+# Processed textures are kept on disk so later runs skip the decode and resize (None disables this)
+processed_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "spinning_cube")
+processed_cache_header = struct.Struct("<8sIII")  # Magic, width, height, components; raw pixels follow
+processed_cache_magic = b"CUBETEX2"  # Bumped when the processing changes, older files are redone
+processed_cache_max_bytes = 2 * 1024 * 1024 * 1024  # Disk cap (2 GB), least recently used textures go first
+
+# Session logs (see SessionRecorder): a header with the scene settings, then one record per event, each the
+# microseconds since the previous record, the event type and a fixed payload, plus text for some events
+session_log_magic = b"CUBELOG1"
+session_record_header = struct.Struct("<IB")
+session_tick, session_key, session_commands, session_image, session_swap, session_move, session_rebuild = range(1, 8)
+session_payloads = {
+    session_tick: struct.Struct("<HB"),  # Simulation steps, 1 if a frame was rendered
+    session_key: struct.Struct("<H"),  # Length of the key name that follows
+    session_commands: struct.Struct("<I"),  # Length of the JSON command batch that follows
+    session_image: struct.Struct("<IH"),  # Image id, length of the path that follows
+    session_swap: struct.Struct("<IBI"),  # Cube, face, image id
+    session_move: struct.Struct("<Iddd"),  # Cube, new translation
+    session_rebuild: struct.Struct("<IB"),  # Cube rebuilt with new images, 1 if by the command before the steps
+}
+
+# Content hashes of source images, so unchanged files are not read again to find their cache entry
+processed_cache_index = None  # "path|mtime_ns|size" -> SHA-1 of the file, loaded on first use
+processed_cache_index_changed = False  # New entries are written out together at exit
+processed_cache_lock = threading.Lock()
+
+# Function to build the cache key for an image
+def texture_key(image_path):
+    return (os.path.abspath(image_path), os.path.getmtime(image_path))
+
+# Function to return the power of two nearest to n (rounding up on a tie), but not above limit
+def nearest_power_of_two(n, limit):
+    below = 1 << (max(1, n).bit_length() - 1)
+    nearest = below * 2 if n - below >= below * 2 - n else below
+    return min(nearest, 1 << (max(1, limit).bit_length() - 1))
+
+# Function to load the content hash index of the disk cache, pruning the cache the first time
+def load_processed_cache_index():
+    global processed_cache_index
+
+    if processed_cache_index is None:
+        try:
+            with open(os.path.join(processed_cache_dir, "index.json")) as f:
+                processed_cache_index = json.load(f)
+        except (OSError, ValueError):
+            processed_cache_index = {}
+        prune_processed_cache()
+    return processed_cache_index
+
+# Function to delete the least recently used processed textures until the disk cache is under its cap
+def prune_processed_cache():
+    try:
+        entries = [entry for entry in os.scandir(processed_cache_dir) if entry.name.endswith(".tex")]
+    except OSError:
+        return
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue  # Deleted by another process meanwhile
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= processed_cache_max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass  # In use on Windows, it is tried again next run
+
+# Function to delete the processed textures of a content hash, at every texture size
+def remove_processed_textures(digest):
+    for name in os.listdir(processed_cache_dir) if os.path.isdir(processed_cache_dir) else []:
+        if name.startswith(digest + "-") and name.endswith(".tex"):
+            try:
+                os.remove(os.path.join(processed_cache_dir, name))
+            except OSError:
+                pass
+
+# Function to write the content hash index of the disk cache (caller holds processed_cache_lock)
+def save_processed_cache_index():
+    os.makedirs(processed_cache_dir, exist_ok=True)
+    index_path = os.path.join(processed_cache_dir, "index.json")
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(processed_cache_index, f)
+    os.replace(temp_path, index_path)
+
+# Function to write the content hash index if entries were added, once at exit rather than per new image
+def flush_processed_cache_index():
+    global processed_cache_index_changed
+    with processed_cache_lock:
+        if not processed_cache_index_changed:
+            return
+        processed_cache_index_changed = False
+        try:
+            save_processed_cache_index()
+        except OSError as error:
+            print(f"Could not save texture cache index: {error}")
+
+atexit.register(flush_processed_cache_index)
+
+# Function to return the SHA-1 of an image file, only reading the file when it is new or has changed
+def content_hash(image_path):
+    global processed_cache_index_changed
+    stat = os.stat(image_path)
+    image_path = os.path.abspath(image_path)
+    entry = f"{image_path}|{stat.st_mtime_ns}|{stat.st_size}"
+
+    with processed_cache_lock:
+        digest = load_processed_cache_index().get(entry)
+    if digest is not None:
+        return digest
+
+    sha1 = hashlib.sha1()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    digest = sha1.hexdigest()
+
+    with processed_cache_lock:
+        # Forget older versions of the same file, and their textures unless a copy of that version is indexed
+        stale_digests = set()
+        for stale in [key for key in processed_cache_index if key.rsplit("|", 2)[0] == image_path]:
+            stale_digests.add(processed_cache_index.pop(stale))
+        processed_cache_index[entry] = digest
+        processed_cache_index_changed = True
+        for stale_digest in stale_digests - set(processed_cache_index.values()):
+            remove_processed_textures(stale_digest)
+    return digest
+
+# Function to find where the processed version of an image lives in the disk cache
+def processed_cache_path(image_path):
+    if not processed_cache_dir:
+        return None
+    # Keyed by content, so copies and renames of an image share one entry and edits get a new one
+    return os.path.join(processed_cache_dir, f"{content_hash(image_path)}-{max_texture_size}.tex")
+
+# Function to load a processed image from the disk cache, returns None if it is missing or damaged
+def load_processed_image(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            magic, width, height, components = processed_cache_header.unpack(f.read(processed_cache_header.size))
+            size = width * height * components
+            if magic != processed_cache_magic or size == 0 or \
+                    os.fstat(f.fileno()).st_size != processed_cache_header.size + size:
+                return None
+
+            image = vtkImageData()
+            image.SetDimensions(width, height, 1)
+            if numpy is None:
+                image.AllocateScalars(VTK_UNSIGNED_CHAR, components)
+                memoryview(image.GetPointData().GetScalars()).cast("B")[:] = f.read()
+                return image
+
+            # Map the pixels and hand the mapping to VTK as the image scalars: no decode and no copy.
+            # ACCESS_COPY keeps the file untouched if anything ever writes into the texture.
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    pixels = numpy.frombuffer(mapped, dtype=numpy.uint8, count=size, offset=processed_cache_header.size)
+    image.GetPointData().SetScalars(numpy_support.numpy_to_vtk(pixels.reshape(-1, components), deep=False))
+    return image
+
+# Function to store a processed image in the disk cache
+def save_processed_image(cache_path, image):
+    width, height, _ = image.GetDimensions()
+    components = image.GetNumberOfScalarComponents()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+    # Write to a temporary file first so a concurrent reader never sees half a texture
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(processed_cache_header.pack(processed_cache_magic, width, height, components))
+        f.write(memoryview(image.GetPointData().GetScalars()))
+    os.replace(temp_path, cache_path)
+
+# Function to decode an image and resample it to a power-of-two texture (safe to run on a worker thread)
+def decode_image(image_path, use_disk_cache=True, high_quality=True):
+    cache_path = processed_cache_path(image_path) if use_disk_cache else None
+    if cache_path and os.path.exists(cache_path):
+        image = load_processed_image(cache_path)
+        if image is not None:
+            try:
+                os.utime(cache_path)  # Recently used, so prune_processed_cache() keeps it
+            except OSError:
+                pass
+            return image
+
+    reader = vtkImageReader2Factory.CreateImageReader2(image_path)
+    if reader is None:
+        print(f"Unsupported image format: {image_path}")
+        return None
+    reader.SetFileName(image_path)
+    reader.Update()
+    source = reader
+
+    # 16-bit and float images (e.g. some TIFFs) are scaled down to 8 bits per channel
+    if reader.GetOutput().GetScalarType() != VTK_UNSIGNED_CHAR:
+        low, high = reader.GetOutput().GetScalarRange()
+        source = vtkImageShiftScale()
+        source.SetInputConnection(reader.GetOutputPort())
+        source.SetShift(-low)
+        source.SetScale(255.0 / (high - low) if high > low else 1.0)
+        source.SetOutputScalarTypeToUnsignedChar()
+        source.ClampOverflowOn()
+
+    # Power-of-two dimensions no larger than max_texture_size, so the GPU can build a full mipmap chain
+    width, height, _ = reader.GetOutput().GetDimensions()
+    texture_width = nearest_power_of_two(width, max_texture_size)
+    texture_height = nearest_power_of_two(height, max_texture_size)
+    resize = vtkImageResize()
+    resize.SetInputConnection(source.GetOutputPort())
+    resize.SetOutputDimensions(texture_width, texture_height, 1)
+    if not high_quality:
+        # Linear is about 4x faster than the default windowed sinc, which matters for video frames
+        interpolator = vtkImageInterpolator()
+        interpolator.SetInterpolationModeToLinear()
+        resize.SetInterpolator(interpolator)
+    resize.Update()
+
+    # Keep the processed pixels without holding on to the pipeline
+    image = vtkImageData()
+    image.DeepCopy(resize.GetOutput())
+
+    if cache_path:
+        try:
+            save_processed_image(cache_path, image)
+        except OSError as error:
+            print(f"Could not cache processed texture for {image_path}: {error}")
+    return image
+
+# Function to copy new pixels into an existing image, only reallocating when the buffer is too small
+def update_image_in_place(image, source):
+    scalars = image.GetPointData().GetScalars()
+    if (scalars is not None
+            and image.GetNumberOfScalarComponents() == source.GetNumberOfScalarComponents()
+            and image.GetScalarType() == source.GetScalarType()):
+        if image.GetDimensions() != source.GetDimensions():
+            # A smaller image keeps the larger buffer, so mixed sizes do not reallocate on every swap
+            image.SetExtent(source.GetExtent())
+            scalars.SetNumberOfTuples(source.GetNumberOfPoints())
+        image.SetOrigin(source.GetOrigin())
+        image.SetSpacing(source.GetSpacing())
+        memoryview(scalars).cast("B")[:] = memoryview(source.GetPointData().GetScalars()).cast("B")
+    else:
+        image.DeepCopy(source)
+    image.Modified()  # Makes the texture upload the new pixels on the next render
+
+# Function to create a texture whose pixels are replaced in place instead of swapping in another texture
+def create_reusable_texture():
+    texture = vtkTexture()
+    texture.SetInputData(vtkImageData())
+    texture.InterpolateOn()
+    texture.MipmapOn()
+    return texture
+
+# Function to copy a texture's pixels into a reusable texture (the GPU keeps the same texture object)
+def copy_texture_in_place(texture, source):
+    update_image_in_place(texture.GetInput(), source.GetInput())
+    texture.SetMipmap(source.GetMipmap())
+
+# Function to shrink an image by 2**lod in each direction, averaging each block of pixels
+def shrink_image(image, lod):
+    width, height, _ = image.GetDimensions()
+    shrink = vtkImageShrink3D()
+    shrink.SetInputData(image)
+    shrink.SetShrinkFactors(min(2 ** lod, width), min(2 ** lod, height), 1)
+    shrink.AveragingOn()
+    shrink.Update()
+
+    shrunk = vtkImageData()
+    shrunk.DeepCopy(shrink.GetOutput())
+    return shrunk
+
+# Function to load a texture through the cache (decodes each image only once).
+# A level of detail (lod) above 0 gives a copy shrunk by 2**lod, for cubes that are far away or small on screen.
+def get_cached_texture(image_path, lod=0):
+    try:
+        key = texture_key(image_path) + ((lod,) if lod else ())
+    except OSError:  # Missing, or deleted since it was named
+        print(f"Image not found: {image_path}")
+        return None
+    if key in texture_cache:
+        texture_cache.move_to_end(key)  # Mark as most recently used
+        return texture_cache[key][0]
+
+    if lod:
+        # Smaller levels are made from the full size texture, which is cached too
+        full_texture = get_cached_texture(image_path)
+        if full_texture is None:
+            return None
+        image = shrink_image(full_texture.GetInput(), lod)
+    else:
+        # Use the prefetched image if there is one, otherwise decode it here
+        future = prefetch_futures.pop(key, None)
+        try:
+            image = future.result() if future is not None else decode_image(image_path)
+        except OSError as error:  # e.g. deleted while it was being decoded
+            print(f"Could not read {image_path}: {error}")
+            return None
+        if image is None:
+            return None
+
+    texture = vtkTexture()
+    texture.SetInputData(image)
+    texture.InterpolateOn()
+    texture.MipmapOn()  # Faces far from the camera sample a smaller level instead of aliasing
+    add_to_texture_cache(key, texture)
+    return texture
+
+# Function to empty the in-memory texture cache and drop pending prefetches (the disk cache is kept)
+def clear_texture_cache():
+    global texture_cache_bytes
+    texture_cache.clear()
+    atlas_regions.clear()
+    texture_cache_bytes = 0
+    for future in prefetch_futures.values():
+        future.cancel()
+    prefetch_futures.clear()
+
+# Function to start decoding an image in the background if it is not cached or pending already
+def prefetch_image(image_path):
+    try:
+        key = texture_key(image_path)
+    except OSError:
+        return  # Missing: get_cached_texture() reports it
+    if key in texture_cache or key in prefetch_futures:
+        return
+
+    # Drop older prefetches of the same file, it has changed on disk since
+    for stale_key in [k for k in prefetch_futures if k[0] == key[0]]:
+        prefetch_futures.pop(stale_key).cancel()
+
+    prefetch_futures[key] = prefetch_executor.submit(decode_image, image_path)
+
+# Function to drop pending or finished prefetches of images nobody is going to show, so their decoded pixels
+# are not kept outside the texture cache's cap
+def drop_prefetches(image_paths):
+    paths = {os.path.abspath(image_path) for image_path in image_paths}
+    for key in [k for k in prefetch_futures if k[0] in paths]:
+        prefetch_futures.pop(key).cancel()
+
+# Function to check whether an image is cached or decoded already, so its texture can be made without waiting
+# A missing image counts as ready, as get_cached_texture() returns None for it straight away.
+def texture_ready(image_path):
+    try:
+        key = texture_key(image_path)
+    except OSError:
+        return True
+    future = prefetch_futures.get(key)
+    return key in texture_cache or (future is not None and future.done())
+
+# Function to create an untextured face for a cube
+def create_face(origin, point1, point2):
+    plane = vtkPlaneSource()
+    plane.SetOrigin(*origin)
+    plane.SetPoint1(*point1)
+    plane.SetPoint2(*point2)
+
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputConnection(plane.GetOutputPort())
+
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+
+    return actor
+
+# Function to create a textured face for a cube
+def create_textured_face(image_path, origin, point1, point2, lod=0):
+    texture = get_cached_texture(image_path, lod)
+    if texture is None:
+        return None
+
+    actor = create_face(origin, point1, point2)
+    actor.SetTexture(texture)
+
+    return actor
+
+# Function to create a face in a placeholder color and start decoding its image in the background
+def create_placeholder_face(image_path, origin, point1, point2, color):
+    prefetch_image(image_path)
+    actor = create_face(origin, point1, point2)
+    actor.GetProperty().SetColor(*color)
+    return actor
+
+# Function to add a texture to the in-memory cache under key, evicting the least recently used past the cap
+def add_to_texture_cache(key, texture):
+    global texture_cache_bytes
+
+    size = texture.GetInput().GetActualMemorySize() * 1024  # GetActualMemorySize() is in KiB
+    texture_cache[key] = (texture, size)
+    texture_cache_bytes += size
+
+    # Evict least recently used images until we are back under the cap
+    while texture_cache_bytes > texture_cache_max_bytes and len(texture_cache) > 1:
+        evicted_key, (_, evicted_size) = texture_cache.popitem(last=False)
+        texture_cache_bytes -= evicted_size
+        atlas_regions.pop(evicted_key, None)
+
+# Function to copy an image into the cell at (column, row) of an RGB atlas image, resized to the cell
+def blit_atlas_cell(atlas_image, image, column, row, cell_width, cell_height):
+    cell = image
+    if image.GetDimensions()[:2] != (cell_width, cell_height):
+        resize = vtkImageResize()
+        resize.SetInputData(image)
+        resize.SetOutputDimensions(cell_width, cell_height, 1)
+        resize.Update()
+        cell = resize.GetOutput()
+
+    # Grayscale and RGBA images are converted to RGB so every cell has the same layout
+    if cell.GetNumberOfScalarComponents() != 3:
+        rgb = vtkImageExtractComponents()
+        rgb.SetInputData(cell)
+        if cell.GetNumberOfScalarComponents() >= 3:
+            rgb.SetComponents(0, 1, 2)
+        else:
+            rgb.SetComponents(0, 0, 0)
+        rgb.Update()
+        cell = rgb.GetOutput()
+
+    # Image rows go bottom to top, in the atlas as in the cell
+    atlas_width = atlas_image.GetDimensions()[0]
+    source = memoryview(cell.GetPointData().GetScalars()).cast("B")
+    target = memoryview(atlas_image.GetPointData().GetScalars()).cast("B")
+    row_bytes = cell_width * 3
+    for y in range(cell_height):
+        offset = ((row * cell_height + y) * atlas_width + column * cell_width) * 3
+        target[offset:offset + row_bytes] = source[y * row_bytes:(y + 1) * row_bytes]
+
+# Function to pack images into a new atlas texture, one cell each in a near-square grid. The atlas is padded
+# to power-of-two dimensions and mipmapped like the per-face textures. Returns the texture, each cell's
+# (u0, v0, u1, v1) and the (columns, cell width, cell height) layout for blitting into the cells later.
+def compose_atlas(images):
+    # Every image gets a cell of the same size
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    cell_width = max(image.GetDimensions()[0] for image in images)
+    cell_height = max(image.GetDimensions()[1] for image in images)
+    width = 1 << (cell_width * columns - 1).bit_length()
+    height = 1 << (cell_height * rows - 1).bit_length()
+
+    atlas_image = vtkImageData()
+    atlas_image.SetDimensions(width, height, 1)
+    atlas_image.AllocateScalars(VTK_UNSIGNED_CHAR, 3)
+    atlas_image.GetPointData().GetScalars().Fill(0)  # The padding is never sampled
+
+    # Inset by half a texel so interpolation does not bleed in the neighbouring cell
+    regions = []
+    for i, image in enumerate(images):
+        row, column = divmod(i, columns)
+        blit_atlas_cell(atlas_image, image, column, row, cell_width, cell_height)
+        regions.append(((column * cell_width + 0.5) / width, (row * cell_height + 0.5) / height,
+                        ((column + 1) * cell_width - 0.5) / width, ((row + 1) * cell_height - 0.5) / height))
+
+    texture = vtkTexture()
+    texture.SetInputData(atlas_image)
+    texture.InterpolateOn()
+    texture.MipmapOn()  # Faces far from the camera sample a smaller level instead of aliasing
+    return texture, regions, (columns, cell_width, cell_height)
+
+# Function to pack images into one atlas texture, returns the texture and each image's (u0, v0, u1, v1).
+# Atlases are kept in the texture cache, keyed by their images' cache keys.
+def build_texture_atlas(image_paths, lod=0):
+    unique_paths = list(dict.fromkeys(image_paths))
+    images = []
+    for image_path in unique_paths:
+        texture = get_cached_texture(image_path, lod)
+        if texture is None:
+            return None, {}
+        images.append(texture.GetInput())
+
+    # A single image is its own atlas, so lockstep swaps reuse the cached texture as is
+    if len(images) == 1:
+        return get_cached_texture(unique_paths[0], lod), {unique_paths[0]: (0.0, 0.0, 1.0, 1.0)}
+
+    try:
+        key = ("atlas", lod) + tuple(texture_key(image_path) for image_path in unique_paths)
+    except OSError:  # Deleted since it was loaded
+        return None, {}
+    if key in texture_cache:
+        texture_cache.move_to_end(key)
+        return texture_cache[key][0], atlas_regions[key]
+
+    texture, regions, _ = compose_atlas(images)
+    add_to_texture_cache(key, texture)
+    atlas_regions[key] = dict(zip(unique_paths, regions))
+    return texture, atlas_regions[key]
+
+# Function to point each face's texture coordinates at its (u0, v0, u1, v1) region of the atlas
+def set_atlas_texture_coords(polydata, face_regions):
+    tcoords = vtkFloatArray()
+    tcoords.SetName("TextureCoordinates")
+    tcoords.SetNumberOfComponents(2)
+    for u0, v0, u1, v1 in face_regions:
+        tcoords.InsertNextTuple2(u0, v0)
+        tcoords.InsertNextTuple2(u1, v0)
+        tcoords.InsertNextTuple2(u1, v1)
+        tcoords.InsertNextTuple2(u0, v1)
+    polydata.GetPointData().SetTCoords(tcoords)
+    polydata.Modified()
+
+# Function to create the whole cube as one mesh and one texture atlas (one draw call instead of six).
+# atlas can be a (texture, each face's region) to use instead of the shared atlas of the faces' images.
+def create_atlas_cube(faces, lod=0, atlas=None):
+    if atlas is None:
+        texture, regions = build_texture_atlas([face["image"] for face in faces], lod)
+        if texture is None:
+            return None
+        atlas = (texture, [regions[face["image"]] for face in faces])
+    texture, face_regions = atlas
+
+    points = vtkPoints()
+    normals = vtkFloatArray()
+    normals.SetNumberOfComponents(3)
+    quads = vtkCellArray()
+    for face in faces:
+        # Same corner order as vtkPlaneSource: origin, point1, opposite corner, point2
+        origin, point1, point2 = face["origin"], face["point1"], face["point2"]
+        axis1 = [point1[i] - origin[i] for i in range(3)]
+        axis2 = [point2[i] - origin[i] for i in range(3)]
+        corner = [point1[i] + axis2[i] for i in range(3)]
+
+        normal = [0.0, 0.0, 0.0]
+        vtkMath.Cross(axis1, axis2, normal)
+        vtkMath.Normalize(normal)
+
+        first_id = points.GetNumberOfPoints()
+        for point in (origin, point1, corner, point2):
+            points.InsertNextPoint(*point)
+            normals.InsertNextTuple3(*normal)
+        quads.InsertNextCell(4, [first_id, first_id + 1, first_id + 2, first_id + 3])
+
+    polydata = vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.SetPolys(quads)
+    polydata.GetPointData().SetNormals(normals)
+    set_atlas_texture_coords(polydata, face_regions)
+
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputData(polydata)
+
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+    actor.SetTexture(texture)
+
+    return actor
+
+# Function to swap the images shown on an atlas cube, returns the new atlas texture
+def set_atlas_cube_images(actor, faces, lod=0):
+    texture, regions = build_texture_atlas([face["image"] for face in faces], lod)
+    if texture is None:
+        return None
+
+    set_atlas_texture_coords(actor.GetMapper().GetInput(), [regions[face["image"]] for face in faces])
+    actor.SetTexture(texture)
+    return texture
+
+
+# Function to make a unit quaternion (w, x, y, z) that rotates by degrees about an axis
+def quaternion_from_axis_angle(axis, degrees):
+    length = math.sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2])
+    if length == 0:
+        return (1.0, 0.0, 0.0, 0.0)
+    half = math.radians(degrees) / 2
+    s = math.sin(half) / length
+    return (math.cos(half), axis[0] * s, axis[1] * s, axis[2] * s)
+
+# Function to make the quaternion of RotateX(x), then RotateY(y), then RotateZ(z) (angles in degrees)
+def quaternion_from_euler(x, y, z):
+    # The product qx * qy * qz written out, the same as CubeGrid does for whole arrays
+    x, y, z = x * (math.pi / 360), y * (math.pi / 360), z * (math.pi / 360)  # Half angles in radians
+    cx, sx, cy, sy, cz, sz = math.cos(x), math.sin(x), math.cos(y), math.sin(y), math.cos(z), math.sin(z)
+    cxcy, sxsy, sxcy, cxsy = cx * cy, sx * sy, sx * cy, cx * sy
+    return (cxcy * cz - sxsy * sz, sxcy * cz + cxsy * sz, cxsy * cz - sxcy * sz, cxcy * sz + sxsy * cz)
+
+# Function to multiply two quaternions (the result rotates by b first, then by a)
+def quaternion_multiply(a, b):
+    aw, ax, ay, az = a
+    bw, bx, by, bz = b
+    return (aw * bw - ax * bx - ay * by - az * bz, aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx, aw * bz + ax * by - ay * bx + az * bw)
+
+# Function to scale a quaternion back to unit length
+def quaternion_normalize(q):
+    length = math.sqrt(q[0] * q[0] + q[1] * q[1] + q[2] * q[2] + q[3] * q[3])
+    return (q[0] / length, q[1] / length, q[2] / length, q[3] / length)
+
+# Function to interpolate between two orientations at constant angular speed (t from 0 to 1)
+def quaternion_slerp(a, b, t):
+    dot = a[0] * b[0] + a[1] * b[1] + a[2] * b[2] + a[3] * b[3]
+    if dot < 0:  # q and -q are the same orientation, take the shorter way round
+        b = (-b[0], -b[1], -b[2], -b[3])
+        dot = -dot
+    if dot > 0.9995:
+        # Nearly the same orientation: linear interpolation is exact enough and avoids dividing by ~0
+        return quaternion_normalize(tuple(a[i] + (b[i] - a[i]) * t for i in range(4)))
+    theta = math.acos(dot)
+    wa = math.sin((1 - t) * theta) / math.sin(theta)
+    wb = math.sin(t * theta) / math.sin(theta)
+    return tuple(wa * a[i] + wb * b[i] for i in range(4))
+
+# Function to build the 4x4 matrix (16 values, row by row) that rotates by q about pivot and then translates
+def rotation_matrix(q, translation=(0.0, 0.0, 0.0), pivot=(0.0, 0.0, 0.0)):
+    w, x, y, z = q
+    r00, r01, r02 = 1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)
+    r10, r11, r12 = 2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)
+    r20, r21, r22 = 2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)
+    # Translate(translation + pivot) * R * Translate(-pivot)
+    px, py, pz = pivot
+    return [r00, r01, r02, translation[0] + px - (r00 * px + r01 * py + r02 * pz),
+            r10, r11, r12, translation[1] + py - (r10 * px + r11 * py + r12 * pz),
+            r20, r21, r22, translation[2] + pz - (r20 * px + r21 * py + r22 * pz),
+            0.0, 0.0, 0.0, 1.0]
+
+# Function to copy a vtkMatrix4x4 into a 4x4 NumPy array
+def matrix_to_numpy(matrix):
+    return numpy.array([matrix.GetElement(i, j) for i in range(4) for j in range(4)]).reshape(4, 4)
+
+
+# Define cube face coordinates (a unit cube centred on the origin)
+cube_faces = [
+    {"image": "", "origin": [-0.5, -0.5, -0.5], "point1": [0.5, -0.5, -0.5], "point2": [-0.5, 0.5, -0.5]},
+    {"image": "", "origin": [-0.5, -0.5, 0.5], "point1": [0.5, -0.5, 0.5], "point2": [-0.5, 0.5, 0.5]},
+    {"image": "", "origin": [-0.5, -0.5, -0.5], "point1": [-0.5, 0.5, -0.5], "point2": [-0.5, -0.5, 0.5]},
+    {"image": "", "origin": [0.5, -0.5, -0.5], "point1": [0.5, 0.5, -0.5], "point2": [0.5, -0.5, 0.5]},
+    {"image": "", "origin": [-0.5, 0.5, -0.5], "point1": [0.5, 0.5, -0.5], "point2": [-0.5, 0.5, 0.5]},
+    {"image": "", "origin": [-0.5, -0.5, -0.5], "point1": [0.5, -0.5, -0.5], "point2": [-0.5, -0.5, 0.5]},
+]
+
+# Colors faces show until their images are decoded (see SpinningCube's defer_textures), one per face
+placeholder_colors = [(0.85, 0.35, 0.3), (0.3, 0.65, 0.4), (0.3, 0.45, 0.8),
+                      (0.85, 0.7, 0.3), (0.6, 0.4, 0.75), (0.3, 0.7, 0.75)]
+
+# Default list of images to cycle through
+images_to_cycle = ["harambee_logo2.jpg", "amentum.jpg"]
+
+# Length of one simulation step in ms (the cube turns 1 degree per step, i.e. 100 degrees per second)
+simulation_step_ms = 10
+
+# Options that shape the scene, with their defaults: recordings store them, and replays and tile workers
+# build the same scene from them (see build_scene)
+scene_settings = {"width": 800, "height": 600, "images": None, "image_dir": None, "background": None, "grid": 1,
+                  "atlas": False, "video": None, "video_fps": 30, "gallery": None, "reuse_textures": False,
+                  "cull": False, "pivot": None, "spin": None}
+
+
+# Fixed-timestep clock: turns elapsed wall time into a whole number of simulation steps
+class AnimationClock:
+    def __init__(self, step_ms=simulation_step_ms, max_steps_per_frame=25):
+        self.step = step_ms / 1000
+        self.max_steps_per_frame = max_steps_per_frame  # Beyond this the backlog is dropped, not replayed
+        self.last_time = None
+        self.accumulator = 0.0
+        self.skipped_steps = 0
+
+    # Function to return how many simulation steps are due since the last call
+    def steps_due(self):
+        now = time.perf_counter()
+        if self.last_time is None:
+            self.last_time = now
+            return 0
+
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        steps = int(self.accumulator / self.step)
+        self.accumulator -= steps * self.step
+        if steps > self.max_steps_per_frame:
+            # After a long stall (window drag, debugger) jump ahead instead of spinning through the backlog
+            self.skipped_steps += steps - self.max_steps_per_frame
+            steps = self.max_steps_per_frame
+        return steps
+
+
+# Images to cycle through, taken from a directory that is watched for additions and removals
+class ImageDirectory:
+    extensions = image_extensions
+
+    def __init__(self, path, poll_interval=1.0):
+        self.path = path
+        self.poll_interval = poll_interval  # Seconds between checks of the directory mtime
+        self.images = []  # Sorted paths of the valid images
+        self.version = 0  # Bumped whenever self.images changes
+        self.names = set()
+        self.dir_mtime = None
+        self.last_poll = None
+        self.poll()
+
+    # Function to pick up added and removed images; only lists the directory when its mtime changed
+    def poll(self):
+        now = time.monotonic()
+        if self.last_poll is not None and now - self.last_poll < self.poll_interval:
+            return
+        self.last_poll = now
+
+        try:
+            dir_mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if dir_mtime == self.dir_mtime:
+            return
+        self.dir_mtime = dir_mtime
+
+        names = set()
+        if dir_mtime is not None:
+            with os.scandir(self.path) as entries:
+                names = {entry.name for entry in entries
+                         if entry.name.lower().endswith(self.extensions) and entry.is_file()}
+
+        # Update the sorted index in place instead of rebuilding it
+        removed = self.names - names
+        added = names - self.names
+        for name in removed:
+            image_path = os.path.join(self.path, name)
+            del self.images[bisect.bisect_left(self.images, image_path)]
+        for name in added:
+            bisect.insort(self.images, os.path.join(self.path, name))
+        self.names = names
+
+        if added or removed:
+            self.version += 1
+            print(f"Image directory {self.path}: {len(added)} added, {len(removed)} removed, {len(self.images)} total")
+
+
+# A texture that plays an image-sequence directory, decoded ahead on a background thread
+class VideoTexture:
+    def __init__(self, frames_dir, fps=30, buffer_size=8):
+        self.frame_paths = sorted(os.path.join(frames_dir, name) for name in os.listdir(frames_dir)
+                                  if name.lower().endswith(image_extensions))
+        if not self.frame_paths:
+            raise ValueError(f"No video frames found in {frames_dir}")
+        self.fps = fps
+
+        # One image and one texture for the whole video; each new frame is copied into the same buffer
+        self.image = vtkImageData()
+        self.texture = vtkTexture()
+        self.texture.SetInputData(self.image)
+        self.texture.InterpolateOn()
+
+        # Bounded ring buffer between the decoder thread and the render thread
+        self.frames = queue.Queue(maxsize=buffer_size)  # (frame number, vtkImageData)
+        self.peeked = None  # A decoded frame that is not due yet
+        self.wanted_frame = 0  # The decoder skips anything older than this
+        self.shown_frame = -1
+        self.dropped_frames = 0
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.decode_loop, daemon=True)
+        self.thread.start()
+
+        # Show the first frame straight away
+        self.update(0.0, wait=True)
+
+    # Background thread: decode frames in order, jumping ahead when the render side has moved past them
+    def decode_loop(self):
+        frame_number = 0
+        while not self.stop_event.is_set():
+            frame_number = max(frame_number, self.wanted_frame)
+            image_path = self.frame_paths[frame_number % len(self.frame_paths)]
+            # Frames are seen once per loop: keep them off disk and resample them the fast way
+            image = decode_image(image_path, use_disk_cache=False, high_quality=False)
+            if image is None:
+                frame_number += 1
+                continue
+
+            while not self.stop_event.is_set():
+                try:
+                    self.frames.put((frame_number, image), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            frame_number += 1
+
+    # Function to show the frame due at time t (seconds); returns True if the texture changed.
+    # Late frames are dropped; if the decoder is behind the last frame stays up (unless wait is set).
+    def update(self, t, wait=False):
+        due = int(t * self.fps)
+        self.wanted_frame = due
+        if due == self.shown_frame:
+            return False
+
+        frame = None
+        while True:
+            if self.peeked is None:
+                try:
+                    self.peeked = self.frames.get(block=wait, timeout=1.0 if wait else None)
+                except queue.Empty:
+                    break
+            if self.peeked[0] > due:
+                break  # Not due yet
+            if frame is not None:
+                self.dropped_frames += 1
+            frame, self.peeked = self.peeked, None
+            if frame[0] == due:
+                break
+
+        if frame is None:
+            return False
+
+        update_image_in_place(self.image, frame[1])
+        self.shown_frame = frame[0]
+        return True
+
+    # Function to stop the decoder thread
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+# One textured cube: its faces, images, rotation and translation
+class SpinningCube:
+    def __init__(self, images=None, position=(0.0, 0.0, 0.0), use_atlas=False, image_source=None,
+                 face_schedules=None, reuse_textures=False, defer_textures=False):
+        self.image_source = image_source  # Optional ImageDirectory that replaces the fixed image list
+        self.image_source_version = None
+        if image_source is not None:
+            images = image_source.images
+            self.image_source_version = image_source.version
+        self.images_to_cycle = list(images if images is not None else images_to_cycle)
+        self.current_image_index = 0  # Start with the first image
+        self.faces = [dict(face) for face in cube_faces]
+        self.use_atlas = use_atlas  # One mesh with a packed texture atlas instead of six actors
+
+        # Optional per-face playlists: one {"images": [...], "period": seconds} per face instead of lockstep swaps
+        self.face_schedules = None
+        self.pending_face_swaps = deque()  # Faces whose swap is due, applied a few per frame by the scene
+        self.steps = 0
+        if face_schedules is not None:
+            self.face_schedules = []
+            for i, schedule in enumerate(face_schedules):
+                period_steps = max(1, int(round(schedule["period"] * 1000 / simulation_step_ms)))
+                self.face_schedules.append({
+                    "images": list(schedule["images"]),
+                    "index": 0,
+                    "period_steps": period_steps,
+                    # Stagger the first swaps so faces with the same period do not all change together
+                    "next_swap": period_steps + i * period_steps // len(face_schedules),
+                })
+
+        self.translation = list(position)
+        self.transform = vtkTransform()
+        self.angle_x = 0
+        self.angle_y = 0
+        self.angle_z = 0
+
+        # The orientation is recomputed from whole step counts every tick instead of being accumulated,
+        # so it stays exact however long the cube runs: spin about an axis, times a base orientation,
+        # times the tumble of RotateX/Y/Z by the Euler angles.
+        self.rotation_speed = [1.0, 1.0, 1.0]  # Tumble in degrees per simulation step around x, y and z
+        self.tumble_start = [0.0, 0.0, 0.0]  # Euler angles when the tumble speed was last set
+        self.tumble_steps = 0
+        self.base_orientation = (1.0, 0.0, 0.0, 0.0)
+        self.spin_axis = (0.0, 0.0, 1.0)
+        self.spin_speed = 0.0  # Degrees per simulation step about spin_axis
+        self.spin_steps = 0
+        self.turn = None  # Slerp towards a target orientation: {"from", "to", "step", "steps"}
+        self.pivot = [0.0, 0.0, 0.0]  # Point the cube rotates about, in cube coordinates (e.g. a vertex)
+        self.orientation = self.base_orientation
+        self.turn_per_step = 1.0  # Degrees the fastest rotation turns per step
+        self.rotation_progress = 0.0  # Degrees of that rotation since the last lockstep swap
+
+        self.renderer = None
+        self.actors = []
+        self.face_actors = {}  # Face index -> actor (per-face actors only)
+        self.video = None  # VideoTexture shown on every face instead of still images
+
+        # Optionally keep the same textures for the cube's whole life and copy each new image into them.
+        # Swaps then cost a pixel copy and upload instead of a new GPU texture per cached image.
+        # Each slot (one per face with playlists, else one for the cube) keeps a texture per image size,
+        # since resizing a GPU texture on every swap fragments driver memory over a long run.
+        self.reuse_textures = reuse_textures
+        self.reusable_textures = []  # Slot -> {(dimensions, components): vtkTexture}
+        self.reusable_texture_sources = []  # Slot -> texture last copied in, to skip copying it again
+
+        # Set by the scene's CubeCuller: cubes outside the view keep counting steps but skip their transform
+        # and texture work until they are back in view, and far away cubes use smaller textures
+        self.visible = True
+        self.textures_stale = False  # Images changed while hidden, textures are applied when visible again
+        self.lod = 0  # Texture level of detail, each level halves the texture size
+
+        # Optionally show faces in placeholder colors at first and put their textures on as the images are
+        # decoded in the background, so the first frame does not wait for them (atlas cubes always wait)
+        self.defer_textures = defer_textures
+        self.loading_faces = set()  # Faces still showing a placeholder color
+        # Atlas cubes with playlists draw from their own atlas with a cell per face, so swap_face() only
+        # redraws one cell: {"texture", "layout": (columns, cell width, cell height)}
+        self.face_atlas = None
+        self.rebuild_pending = False  # New images were set, the cube is rebuilt once the first one is decoded
+        self.update_transform()
+        self.build()
+
+    # Function to (re)build the cube actors showing the current image
+    def build(self):
+        self.rebuild_pending = False
+        renderer = self.renderer
+        if renderer is not None:
+            self.remove_from(renderer)
+        self.actors = []
+        self.face_actors = {}
+        self.loading_faces = set()
+        if not self.images_to_cycle and self.face_schedules is None:
+            print("No images to show")
+            return
+
+        for i, face in enumerate(self.faces):
+            if self.face_schedules is not None:
+                schedule = self.face_schedules[i]
+                face["image"] = schedule["images"][schedule["index"]]
+            else:
+                face["image"] = self.images_to_cycle[self.current_image_index]
+
+        if self.use_atlas:
+            self.face_atlas = None
+            if self.face_schedules is not None:
+                atlas = self.compose_face_atlas()
+                actor = create_atlas_cube(self.faces, self.lod, atlas) if atlas is not None else None
+            else:
+                actor = create_atlas_cube(self.faces, self.lod)
+                if actor:
+                    self.set_actor_texture(actor, actor.GetTexture())
+            if actor:
+                self.actors.append(actor)
+        else:
+            for i, face in enumerate(self.faces):
+                if self.defer_textures and os.path.exists(face["image"]) and not texture_ready(face["image"]):
+                    actor = create_placeholder_face(face["image"], face["origin"], face["point1"], face["point2"],
+                                                    placeholder_colors[i % len(placeholder_colors)])
+                    self.loading_faces.add(i)
+                else:
+                    actor = create_textured_face(face["image"], face["origin"], face["point1"], face["point2"],
+                                                 self.lod)
+                    if actor:
+                        self.set_actor_texture(actor, actor.GetTexture(), self.texture_slot(i))
+                if actor:
+                    self.actors.append(actor)
+                    self.face_actors[i] = actor
+
+        for actor in self.actors:
+            actor.SetUserTransform(self.transform)
+            actor.SetVisibility(self.visible)
+        self.textures_stale = False
+        if self.video is not None:
+            self.play_video(self.video)
+        if renderer is not None:
+            self.add_to(renderer)
+
+        # Start decoding the next images while the first one is on screen
+        self.prefetch_next_images()
+
+    # Function to add the cube's actors to a renderer
+    def add_to(self, renderer):
+        self.renderer = renderer
+        for actor in self.actors:
+            renderer.AddActor(actor)
+
+    # Function to remove the cube's actors from its renderer
+    def remove_from(self, renderer):
+        for actor in self.actors:
+            renderer.RemoveActor(actor)
+        self.renderer = None
+
+    # Function to return the images the cube shows now or will show next, i.e. the ones it prefetches
+    def upcoming_images(self):
+        images = {face["image"] for face in self.faces if "image" in face}
+        if self.face_schedules is not None:
+            for schedule in self.face_schedules:
+                images.add(schedule["images"][(schedule["index"] + 1) % len(schedule["images"])])
+        elif self.images_to_cycle:
+            for step in range(1, prefetch_depth + 1):
+                images.add(self.images_to_cycle[(self.current_image_index + step) % len(self.images_to_cycle)])
+        return images
+
+    # Function to start decoding the next images in the cycle in the background
+    def prefetch_next_images(self):
+        if self.face_schedules is not None:
+            for schedule in self.face_schedules:
+                prefetch_image(schedule["images"][(schedule["index"] + 1) % len(schedule["images"])])
+            return
+        if not self.images_to_cycle:
+            return
+        for step in range(1, prefetch_depth + 1):
+            image_path = self.images_to_cycle[(self.current_image_index + step) % len(self.images_to_cycle)]
+            prefetch_image(image_path)
+
+    # Function to pick up changes from the image directory, keeping our place in the cycle
+    def refresh_images(self):
+        self.image_source.poll()
+        if self.image_source.version == self.image_source_version:
+            return
+        self.image_source_version = self.image_source.version
+        upcoming = self.upcoming_images()
+
+        if self.images_to_cycle:
+            current_image = self.images_to_cycle[self.current_image_index]
+            self.images_to_cycle = list(self.image_source.images)
+            # The next swap shows the first image after the current one, even if it was removed
+            self.current_image_index = bisect.bisect_right(self.images_to_cycle, current_image) - 1
+        else:
+            self.images_to_cycle = list(self.image_source.images)
+            self.current_image_index = 0
+        drop_prefetches(upcoming - self.upcoming_images())  # e.g. removed images that were decoded ahead
+
+    # Function to update textures
+    def update_textures(self):
+        if self.image_source is not None:
+            self.refresh_images()
+        if not self.images_to_cycle:
+            return
+        if not self.actors:
+            # Nothing was shown yet (e.g. the image directory was empty)
+            self.current_image_index = 0
+            self.build()
+            return
+
+        self.current_image_index = (self.current_image_index + 1) % len(self.images_to_cycle)
+        new_image = self.images_to_cycle[self.current_image_index]
+
+        if not self.visible:
+            # Nothing to decode or upload until the cube is back in view
+            for face in self.faces:
+                face["image"] = new_image
+            self.textures_stale = True
+            return
+
+        if self.use_atlas:
+            if not os.path.exists(new_image):
+                print(f"Image not found: {new_image}")
+                return
+
+            for face in self.faces:
+                face["image"] = new_image
+            for actor in self.actors:
+                texture = set_atlas_cube_images(actor, self.faces, self.lod)
+                if texture is not None:
+                    self.set_actor_texture(actor, texture)
+        else:
+            # Decode once and share the same texture across all faces
+            texture = get_cached_texture(new_image, self.lod)
+            if texture is None:
+                return
+
+            for face in self.faces:
+                face["image"] = new_image
+            for actor in self.actors:
+                self.set_actor_texture(actor, texture)
+
+        print(f"Updated cube textures to image: {new_image}")
+
+        # Decode the following images while this one is on screen
+        self.prefetch_next_images()
+
+    # Function to pick the reusable texture a face draws from (faces only differ when they have playlists)
+    def texture_slot(self, i):
+        return i if self.face_schedules is not None else 0
+
+    # Function to put a texture on an actor, copying it into the cube's reusable texture if enabled
+    def set_actor_texture(self, actor, texture, slot=0):
+        if self.reuse_textures:
+            while len(self.reusable_textures) <= slot:
+                self.reusable_textures.append({})
+                self.reusable_texture_sources.append(None)
+            image = texture.GetInput()
+            layout = (image.GetDimensions(), image.GetNumberOfScalarComponents())
+            reusable = self.reusable_textures[slot].get(layout)
+            if reusable is None:
+                reusable = self.reusable_textures[slot][layout] = create_reusable_texture()
+            if self.reusable_texture_sources[slot] is not texture:
+                copy_texture_in_place(reusable, texture)
+                self.reusable_texture_sources[slot] = texture
+            texture = reusable
+        if self.loading_faces:
+            actor.GetProperty().SetColor(1.0, 1.0, 1.0)  # No placeholder tint on the texture
+        actor.SetTexture(texture)
+
+    # Function to put the textures for the current images and level of detail on the actors
+    def refresh_textures(self):
+        self.textures_stale = False
+        if self.video is not None:
+            return
+        if self.use_atlas and self.face_schedules is not None:
+            self.refresh_face_atlas()
+        elif self.use_atlas:
+            for actor in self.actors:
+                texture = set_atlas_cube_images(actor, self.faces, self.lod)
+                if texture is not None:
+                    self.set_actor_texture(actor, texture)
+        else:
+            for i, actor in self.face_actors.items():
+                if i in self.loading_faces and not texture_ready(self.faces[i]["image"]):
+                    continue  # Still decoding, apply_loaded_textures() puts it on
+                texture = get_cached_texture(self.faces[i]["image"], self.lod)
+                if texture is not None:
+                    self.set_actor_texture(actor, texture, self.texture_slot(i))
+
+    # Function to put textures on the faces still showing placeholder colors once their images are decoded,
+    # or with wait, decoding the rest here. Returns True if any face changed.
+    def apply_loaded_textures(self, wait=False):
+        if self.rebuild_pending:
+            if not wait and not texture_ready(self.images_to_cycle[self.current_image_index]):
+                return False
+            self.build()
+            return True
+
+        changed = False
+        for i in list(self.loading_faces):
+            actor = self.face_actors[i]
+            if actor.GetTexture() is None:  # Swaps and videos put textures on by themselves
+                if not self.visible and not wait:
+                    continue  # Hidden by culling: nothing to show yet
+                image_path = self.faces[i]["image"]
+                if not wait and not texture_ready(image_path):
+                    prefetch_image(image_path)  # In case the face moved on to an image nobody is decoding
+                    continue
+                texture = get_cached_texture(image_path, self.lod)
+                if texture is None:
+                    self.loading_faces.discard(i)  # Missing or unreadable: the face keeps its placeholder color
+                    changed = True
+                    continue
+                self.set_actor_texture(actor, texture, self.texture_slot(i))
+            actor.GetProperty().SetColor(1.0, 1.0, 1.0)
+            self.loading_faces.discard(i)
+            changed = True
+        return changed
+
+    # Function to show or hide the cube (used by frustum culling)
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        for actor in self.actors:
+            actor.SetVisibility(visible)
+        if visible:
+            self.update_transform()  # Steps were counted while hidden, the transform was not rebuilt
+            if self.textures_stale:
+                self.refresh_textures()
+
+    # Function to switch to another texture level of detail
+    def set_lod(self, lod):
+        if lod == self.lod:
+            return
+        self.lod = lod
+        if self.visible:
+            self.refresh_textures()
+        else:
+            self.textures_stale = True
+
+    # Function to return the sphere (center, radius) the cube stays inside however it is rotated
+    def bounding_sphere(self):
+        corners = []
+        for face in self.faces:
+            origin, point1, point2 = face["origin"], face["point1"], face["point2"]
+            corners += [origin, point1, point2, [point1[i] + point2[i] - origin[i] for i in range(3)]]
+        radius = max(math.dist(self.pivot, corner) for corner in corners)
+        return [self.translation[i] + self.pivot[i] for i in range(3)], radius
+
+    # Function to replace the list of images to cycle through and show the first one. Unless it is decoded
+    # already, the faces keep their textures until apply_loaded_textures() sees it is, so this never waits.
+    def set_images_to_cycle(self, images):
+        upcoming = self.upcoming_images()
+        self.images_to_cycle = list(images)
+        self.current_image_index = 0
+        first_image = self.images_to_cycle[0] if self.images_to_cycle else None
+        if (not self.actors or self.face_schedules is not None or self.video is not None or first_image is None
+                or not os.path.exists(first_image) or texture_ready(first_image)):
+            self.build()
+        else:
+            for face in self.faces:
+                face["image"] = first_image  # The cube shows this image from now on, its texture follows
+            self.rebuild_pending = True
+            prefetch_image(first_image)
+        drop_prefetches(upcoming - self.upcoming_images())  # Decoded ahead for the old list
+
+    # Function to rotate the cube by one simulation step
+    def rotate_cube(self):
+        if self.turn is not None:
+            self.turn["step"] += 1
+            if self.turn["step"] >= self.turn["steps"]:
+                # Arrived: the target becomes the base and the tumble and spin carry on from there
+                self.base_orientation = self.turn["to"]
+                self.tumble_start = [0.0, 0.0, 0.0]
+                self.tumble_steps = 0
+                self.spin_steps = 0
+                self.turn = None
+        else:
+            self.tumble_steps += 1
+            self.spin_steps += 1
+        if self.visible:
+            self.update_transform()
+
+    # Function to work out the Euler angles of the tumble from its step count
+    def update_angles(self):
+        self.angle_x = (self.tumble_start[0] + self.rotation_speed[0] * self.tumble_steps) % 360
+        self.angle_y = (self.tumble_start[1] + self.rotation_speed[1] * self.tumble_steps) % 360
+        self.angle_z = (self.tumble_start[2] + self.rotation_speed[2] * self.tumble_steps) % 360
+
+    # Function to set the tumble speed around each axis in degrees per second
+    def set_rotation_speed(self, x, y, z):
+        step = simulation_step_ms / 1000
+        self.update_angles()
+        self.tumble_start = [self.angle_x, self.angle_y, self.angle_z]
+        self.tumble_steps = 0
+        self.rotation_speed = [x * step, y * step, z * step]
+        self.turn_per_step = max(abs(self.spin_speed), *(abs(speed) for speed in self.rotation_speed))
+
+    # Function to spin the cube about any axis, in degrees per second on top of its tumble
+    def set_angular_velocity(self, axis, degrees_per_second):
+        # Fold the spin so far into the base orientation, then start counting again
+        spin = quaternion_from_axis_angle(self.spin_axis, (self.spin_speed * self.spin_steps) % 360)
+        self.base_orientation = quaternion_normalize(quaternion_multiply(spin, self.base_orientation))
+        self.spin_steps = 0
+        self.spin_axis = tuple(axis)
+        self.spin_speed = degrees_per_second * simulation_step_ms / 1000
+        self.turn_per_step = max(abs(self.spin_speed), *(abs(speed) for speed in self.rotation_speed))
+
+    # Function to set the point the cube rotates about, in cube coordinates ((-0.5, -0.5, -0.5) is a vertex)
+    def set_pivot(self, x, y, z):
+        self.pivot = [x, y, z]
+        self.update_transform()
+
+    # Function to turn smoothly (slerp) to an orientation over some seconds, then carry on rotating from it
+    def turn_to(self, orientation, seconds=1.0):
+        steps = max(1, int(round(seconds * 1000 / simulation_step_ms)))
+        self.turn = {"from": self.orientation, "to": quaternion_normalize(orientation), "step": 0, "steps": steps}
+
+    # Function to work out the current orientation quaternion
+    def current_orientation(self):
+        if self.turn is not None:
+            return quaternion_slerp(self.turn["from"], self.turn["to"], self.turn["step"] / self.turn["steps"])
+        orientation = quaternion_from_euler(self.angle_x, self.angle_y, self.angle_z)
+        if self.base_orientation != (1.0, 0.0, 0.0, 0.0):
+            orientation = quaternion_normalize(quaternion_multiply(self.base_orientation, orientation))
+        if self.spin_speed:
+            spin = quaternion_from_axis_angle(self.spin_axis, (self.spin_speed * self.spin_steps) % 360)
+            orientation = quaternion_normalize(quaternion_multiply(spin, orientation))
+        return orientation
+
+    # Function to rebuild the cube transform from its translation, pivot and orientation in one step
+    def update_transform(self):
+        # The actors share self.transform, so this moves every face at once
+        self.update_angles()
+        self.orientation = self.current_orientation()
+        self.transform.SetMatrix(rotation_matrix(self.orientation, self.translation, self.pivot))
+
+    # Function to show a VideoTexture on every face (still image swaps stop while it plays)
+    def play_video(self, video):
+        self.video = video
+        if self.use_atlas:
+            # The video covers the whole texture, so every face maps the full image
+            for actor in self.actors:
+                set_atlas_texture_coords(actor.GetMapper().GetInput(), [(0.0, 0.0, 1.0, 1.0)] * len(self.faces))
+        for actor in self.actors:
+            actor.SetTexture(video.texture)
+
+    # Function to advance the cube by one timer tick
+    def tick(self):
+        self.rotate_cube()
+        self.steps += 1
+        if self.video is not None:
+            return False
+
+        if self.face_schedules is not None:
+            # Only queue the faces that are due; the scene spreads the uploads over frames
+            for i, schedule in enumerate(self.face_schedules):
+                if self.steps >= schedule["next_swap"]:
+                    schedule["next_swap"] += schedule["period_steps"]
+                    if i not in self.pending_face_swaps:
+                        self.pending_face_swaps.append(i)
+            return False
+
+        self.rotation_progress += self.turn_per_step
+        if self.rotation_progress >= 360:  # Change texture every full rotation
+            self.rotation_progress -= 360
+            self.update_textures()
+            return True
+        return False
+
+    # Function to swap the image of one face to the next one in its playlist, returns True if a texture changed
+    def swap_face(self, i):
+        schedule = self.face_schedules[i]
+        schedule["index"] = (schedule["index"] + 1) % len(schedule["images"])
+        new_image = schedule["images"][schedule["index"]]
+        self.faces[i]["image"] = new_image
+
+        if not self.visible:
+            self.textures_stale = True
+            return False
+        uploaded = False
+        if self.use_atlas:
+            texture = get_cached_texture(new_image, self.lod)
+            if texture is not None:
+                width, height, _ = texture.GetInput().GetDimensions()
+                _, cell_width, cell_height = self.face_atlas["layout"] if self.face_atlas else (0, 0, 0)
+                if width > cell_width or height > cell_height:
+                    self.refresh_face_atlas()  # Too big for its cell, so the atlas is laid out again
+                else:
+                    self.blit_face(i, texture.GetInput())
+                uploaded = True
+        elif i in self.face_actors:
+            texture = get_cached_texture(new_image, self.lod)
+            if texture is not None:
+                self.set_actor_texture(self.face_actors[i], texture, self.texture_slot(i))
+                uploaded = True
+
+        # Decode this face's following image while this one is on screen
+        prefetch_image(schedule["images"][(schedule["index"] + 1) % len(schedule["images"])])
+        return uploaded
+
+    # Function to apply queued face swaps worth up to limit face-sized texture uploads, returns the uploads
+    # they cost. An atlas cube uploads its whole atlas however many of its cells changed, so it applies all
+    # of its queued swaps at once and counts the atlas as the number of face cells it holds.
+    def apply_face_swaps(self, limit):
+        uploads = 0
+        if self.use_atlas:
+            changed = False
+            while self.pending_face_swaps:
+                changed = self.swap_face(self.pending_face_swaps.popleft()) or changed
+            if changed and self.face_atlas is not None:
+                _, cell_width, cell_height = self.face_atlas["layout"]
+                width, height, _ = self.face_atlas["texture"].GetInput().GetDimensions()
+                uploads = width * height // (cell_width * cell_height)
+            return uploads
+        while self.pending_face_swaps and uploads < limit:
+            if self.swap_face(self.pending_face_swaps.popleft()):
+                uploads += 1  # Hidden cubes upload nothing until they are visible again
+        return uploads
+
+    # Function to pack the faces' current images into the cube's own atlas, one cell per face.
+    # Returns the texture and each face's region, or None if an image cannot be loaded.
+    def compose_face_atlas(self):
+        images = []
+        for face in self.faces:
+            texture = get_cached_texture(face["image"], self.lod)
+            if texture is None:
+                return None
+            images.append(texture.GetInput())
+        texture, regions, layout = compose_atlas(images)
+        self.face_atlas = {"texture": texture, "layout": layout}
+        return texture, regions
+
+    # Function to lay the cube's own atlas out again from the faces' current images and put it on the actor
+    def refresh_face_atlas(self):
+        atlas = self.compose_face_atlas()
+        if atlas is None:
+            return
+        texture, regions = atlas
+        for actor in self.actors:
+            set_atlas_texture_coords(actor.GetMapper().GetInput(), regions)
+            actor.SetTexture(texture)  # Updated in place from now on, so reuse_textures has nothing to add
+
+    # Function to draw a face's new image into its cell of the cube's own atlas
+    def blit_face(self, i, image):
+        columns, cell_width, cell_height = self.face_atlas["layout"]
+        row, column = divmod(i, columns)
+        atlas_image = self.face_atlas["texture"].GetInput()
+        blit_atlas_cell(atlas_image, image, column, row, cell_width, cell_height)
+        atlas_image.Modified()  # Uploaded again on the next render
+
+    # Function to move the cube
+    def translate(self, dx, dy, dz):
+        self.translation[0] += dx
+        self.translation[1] += dy
+        self.translation[2] += dz
+
+
+# Per-frame phase timings kept in a ring buffer, shown as an on-screen overlay while enabled
+class FrameProfiler:
+    phases = ("transform", "texture", "render", "swap")
+
+    def __init__(self, capacity=1000):
+        self.enabled = False
+        self.frames = deque(maxlen=capacity)  # (start time, transform, texture, render, swap, total) in seconds
+        self.current = None
+        self.frame_start = 0.0
+        self.render_start = 0.0
+        self.render_end = 0.0
+
+        self.renderer = None
+        self.render_window = None
+        self.observers = []
+
+        # Overlay in the bottom left corner, refreshed a couple of times per second
+        self.text_actor = vtkTextActor()
+        self.text_actor.SetDisplayPosition(10, 10)
+        self.text_actor.GetTextProperty().SetFontSize(14)
+        self.text_actor.GetTextProperty().SetColor(1.0, 1.0, 1.0)
+        self.overlay_interval = 0.5
+        self.last_overlay_update = 0.0
+
+    # Function to connect the profiler to the renderer and window it measures
+    def attach(self, renderer, render_window):
+        self.renderer = renderer
+        self.render_window = render_window
+
+    # Function to start profiling (observers and overlay only exist while enabled, so off costs nothing)
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.observers = [
+            (self.renderer, self.renderer.AddObserver("StartEvent", self.render_started)),
+            (self.renderer, self.renderer.AddObserver("EndEvent", self.render_finished)),
+            (self.render_window, self.render_window.AddObserver("EndEvent", self.swap_finished)),
+        ]
+        self.renderer.AddViewProp(self.text_actor)
+
+    # Function to stop profiling
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for obj, tag in self.observers:
+            obj.RemoveObserver(tag)
+        self.observers = []
+        self.renderer.RemoveViewProp(self.text_actor)
+
+    # Function to switch profiling on or off
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        print(f"Profiling {'on' if self.enabled else 'off'}")
+
+    # Function to start timing a frame
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.current = dict.fromkeys(self.phases, 0.0)
+
+    # Function to add time to one phase of the current frame
+    def add(self, phase, seconds):
+        self.current[phase] += seconds
+
+    # Render window observers: renderer start to end is drawing, renderer end to window end is the buffer swap
+    def render_started(self, obj, event):
+        self.render_start = time.perf_counter()
+
+    def render_finished(self, obj, event):
+        self.render_end = time.perf_counter()
+        if self.current is not None:
+            self.current["render"] += self.render_end - self.render_start
+
+    def swap_finished(self, obj, event):
+        if self.current is not None:
+            self.current["swap"] += time.perf_counter() - self.render_end
+
+    # Function to finish timing a frame and refresh the overlay when it is due
+    def end_frame(self):
+        now = time.perf_counter()
+        self.frames.append((self.frame_start, *(self.current[phase] for phase in self.phases), now - self.frame_start))
+        self.current = None
+
+        if now - self.last_overlay_update >= self.overlay_interval:
+            self.last_overlay_update = now
+            self.text_actor.SetInput(self.overlay_text())
+
+    # Function to return the 50th, 95th and 99th percentiles of a list of values
+    @staticmethod
+    def percentiles(values):
+        ordered = sorted(values)
+        if not ordered:
+            return 0.0, 0.0, 0.0
+        return tuple(ordered[min(len(ordered) - 1, int(len(ordered) * q))] for q in (0.50, 0.95, 0.99))
+
+    # Function to summarise the frames in the ring buffer
+    def summary(self):
+        if len(self.frames) < 2:
+            return {}
+
+        span = self.frames[-1][0] - self.frames[0][0]
+        result = {"frames": len(self.frames), "fps": (len(self.frames) - 1) / span if span > 0 else 0.0}
+        for i, phase in enumerate(self.phases + ("total",), start=1):
+            p50, p95, p99 = self.percentiles([frame[i] for frame in self.frames])
+            result[phase] = {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000}
+        return result
+
+    # Function to build the overlay text
+    def overlay_text(self):
+        summary = self.summary()
+        if not summary:
+            return ""
+
+        total = summary["total"]
+        lines = [f"{summary['fps']:.1f} FPS   frame p50 {total['p50_ms']:.2f}  p95 {total['p95_ms']:.2f}  "
+                 f"p99 {total['p99_ms']:.2f} ms"]
+        for phase in self.phases:
+            lines.append(f"{phase:<10} p50 {summary[phase]['p50_ms']:.2f}  p95 {summary[phase]['p95_ms']:.2f}  "
+                         f"p99 {summary[phase]['p99_ms']:.2f} ms")
+        return "\n".join(lines)
+
+    # Function to write the recorded frames as CSV, or the frames plus summary as JSON
+    def dump(self, path):
+        columns = ("start",) + self.phases + ("total",)
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"summary": self.summary(),
+                           "frames": [dict(zip(columns, frame)) for frame in self.frames]}, f, indent=2)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(self.frames)
+        print(f"Wrote {len(self.frames)} profiled frames to {path}")
+
+
+# Frustum culling and texture level of detail for scenes with many cubes. The cubes' bounding spheres are
+# kept in a bounding volume tree, so finding the visible ones only walks the parts of the tree that touch the
+# view instead of testing every cube. Nothing is recomputed while the camera and the cubes stay put.
+class CubeCuller:
+    leaf_size = 16  # Cubes per leaf of the tree
+
+    def __init__(self, scene, lod_bias=1.0, max_lod=4, max_lod_changes_per_frame=64):
+        self.scene = scene
+        self.lod_bias = lod_bias  # Above 1 keeps sharper textures, below 1 switches to smaller ones sooner
+        self.max_lod = max_lod
+        self.max_lod_changes_per_frame = max_lod_changes_per_frame  # Spreads texture switches over frames
+
+        self.cubes = []  # Cubes in tree order: every node covers a contiguous run of them
+        self.spheres = []  # (x, y, z, radius) per cube in tree order
+        self.nodes = []  # [min x, min y, min z, max x, max y, max z, start, end, left child, right child]
+        self.offset = [0.0, 0.0, 0.0]  # Moves applied to every cube since the tree was built
+        self.stale = True  # Rebuild the tree before the next query
+        self.view = None  # Camera and viewport the current visible set was computed for
+        self.visible = set()  # Tree positions of the visible cubes
+        self.lod_pending = False
+        self.observer = scene.renderer.AddObserver("StartEvent", self.render_started)
+
+    # Function to build the tree over the bounding spheres of the scene's cubes
+    def rebuild(self):
+        items = []
+        for cube in self.scene.cubes:
+            if hasattr(cube, "bounding_sphere"):
+                center, radius = cube.bounding_sphere()
+                items.append((center[0], center[1], center[2], radius, cube))
+        self.nodes = []
+        if items:
+            self.build_node(items, 0, len(items))
+        self.cubes = [item[4] for item in items]
+        self.spheres = [item[:4] for item in items]
+        self.offset = [0.0, 0.0, 0.0]
+        self.visible = {i for i, cube in enumerate(self.cubes) if cube.visible}
+        self.stale = False
+        self.view = None
+
+    # Function to add the node for items[start:end], splitting it in half along its longest side
+    def build_node(self, items, start, end):
+        bounds = [min(item[axis] - item[3] for item in items[start:end]) for axis in range(3)]
+        bounds += [max(item[axis] + item[3] for item in items[start:end]) for axis in range(3)]
+        index = len(self.nodes)
+        node = bounds + [start, end, -1, -1]
+        self.nodes.append(node)
+        if end - start > self.leaf_size:
+            axis = max(range(3), key=lambda a: bounds[a + 3] - bounds[a])
+            items[start:end] = sorted(items[start:end], key=lambda item: item[axis])
+            middle = (start + end) // 2
+            node[8] = self.build_node(items, start, middle)
+            node[9] = self.build_node(items, middle, end)
+        return index
+
+    # Function to record that every cube moved by the same amount (no rebuild needed)
+    def moved_all(self, dx, dy, dz):
+        self.offset[0] += dx
+        self.offset[1] += dy
+        self.offset[2] += dz
+        self.view = None
+
+    # Function to return the tree positions of the cubes inside the planes (a, b, c, d), inside is >= 0
+    def query(self, planes):
+        # Shift the planes by the common offset instead of moving every sphere
+        ox, oy, oz = self.offset
+        planes = [(a, b, c, d + a * ox + b * oy + c * oz) for a, b, c, d in planes]
+        visible = []
+        stack = [0] if self.nodes else []
+        while stack:
+            x0, y0, z0, x1, y1, z1, start, end, left, right = self.nodes[stack.pop()]
+            outside = False
+            inside = True
+            for a, b, c, d in planes:
+                # The box corner furthest along the plane normal; if even that is outside, so is the box
+                if a * (x1 if a > 0 else x0) + b * (y1 if b > 0 else y0) + c * (z1 if c > 0 else z0) + d < 0:
+                    outside = True
+                    break
+                if a * (x0 if a > 0 else x1) + b * (y0 if b > 0 else y1) + c * (z0 if c > 0 else z1) + d < 0:
+                    inside = False
+            if outside:
+                continue
+            if inside:
+                visible.extend(range(start, end))
+            elif left < 0:
+                for i in range(start, end):
+                    x, y, z, radius = self.spheres[i]
+                    if all(a * x + b * y + c * z + d >= -radius for a, b, c, d in planes):
+                        visible.append(i)
+            else:
+                stack.append(left)
+                stack.append(right)
+        return visible
+
+    # Function to pick a cube's texture level of detail from how large its faces are on screen
+    def choose_lod(self, cube, sphere, camera, pixels_per_unit):
+        if not camera.GetParallelProjection():
+            center = [sphere[i] + self.offset[i] for i in range(3)]
+            pixels_per_unit /= max(math.dist(camera.GetPosition(), center) - sphere[3], 1e-6)
+        level = math.log2(max_texture_size / max(pixels_per_unit * self.lod_bias, 1e-6))
+        # Stay on the current level until the ideal one is clearly different, so cubes do not flicker
+        if cube.lod - 0.1 <= level < cube.lod + 1.1:
+            return cube.lod
+        return min(max(int(level), 0), self.max_lod)
+
+    # Renderer start: bring visibility and levels of detail up to date before anything is drawn
+    def render_started(self, obj, event):
+        self.update()
+
+    # Function to update which cubes are visible and which texture level each one uses
+    def update(self):
+        if self.stale:
+            self.rebuild()
+        renderer = self.scene.renderer
+        camera = renderer.GetActiveCamera()
+        aspect = renderer.GetTiledAspectRatio()
+        height = renderer.GetSize()[1]
+        view = (camera.GetPosition(), camera.GetFocalPoint(), camera.GetViewUp(), camera.GetViewAngle(),
+                camera.GetParallelProjection(), camera.GetParallelScale(), aspect, height)
+        view_changed = view != self.view
+        if not view_changed and not self.lod_pending:
+            return
+        self.view = view
+
+        if view_changed:
+            planes = [0.0] * 24
+            camera.GetFrustumPlanes(aspect, planes)
+            # Only the four side planes: near and far follow the visible cubes and would cull them in turn
+            visible = set(self.query([planes[i:i + 4] for i in range(0, 16, 4)]))
+            for i in self.visible - visible:
+                self.cubes[i].set_visible(False)
+            for i in visible - self.visible:
+                self.cubes[i].set_visible(True)
+            self.visible = visible
+
+        # Screen pixels covered by one unit of length (at distance 1 in perspective projection)
+        if camera.GetParallelProjection():
+            pixels_per_unit = height / (2 * camera.GetParallelScale())
+        else:
+            pixels_per_unit = height / (2 * math.tan(math.radians(camera.GetViewAngle()) / 2))
+        changes = 0
+        self.lod_pending = False
+        for i in self.visible:
+            cube = self.cubes[i]
+            lod = self.choose_lod(cube, self.spheres[i], camera, pixels_per_unit)
+            if lod != cube.lod:
+                if changes == self.max_lod_changes_per_frame:
+                    self.lod_pending = True
+                    self.scene.request_render()  # Finish switching levels over the next frames
+                    break
+                cube.set_lod(lod)
+                changes += 1
+
+    # Function to stop culling and show every cube again
+    def detach(self):
+        self.scene.renderer.RemoveObserver(self.observer)
+        for cube in self.cubes:
+            cube.set_visible(True)
+
+
+# CPU renderer for machines without a GPU, where VTK falls back to slow software OpenGL. It draws the cubes'
+# textured quads with NumPy, mapping every pixel a face covers back through the face's projection (an exact
+# perspective warp), with a depth buffer and back-face rejection. Lighting follows VTK's default headlight.
+class SoftwareRenderer:
+    def __init__(self, scene):
+        if numpy is None:
+            raise ImportError("The NumPy renderer needs NumPy")
+        self.scene = scene
+        self.quads = {}  # Cube -> (polydata versions, quad corners, texture coordinates, outward normals, actors)
+        self.textures = {}  # id(vtkImageData) -> (image, MTime, width, height, texels packed as uint32 RGBX)
+        self.frame = None  # Frame buffer, top row first, one uint32 RGBX per pixel
+        self.depth = None
+        self.origin = (0, 0)  # Frame pixel at the top left of the buffers, when drawing a region
+        self.pixels = None  # Last frame as (height, width, 3) uint8 RGB
+        self.image = vtkImageData()  # The last frame as VTK image data (bottom row first) for writers
+
+    # Function to return a cube's quads in cube coordinates, rebuilt only when its meshes change.
+    # Corners are in VTK's quad order: origin, point1, opposite corner, point2.
+    def cube_quads(self, cube):
+        polydatas = []
+        for actor in cube.actors:
+            mapper = actor.GetMapper()
+            mapper.GetInputAlgorithm().Update()  # Plane sources only make their quad when asked
+            polydatas.append(mapper.GetInput())
+        versions = [(polydata, polydata.GetMTime()) for polydata in polydatas]
+        cached = self.quads.get(cube)
+        if cached is not None and cached[0] == versions:
+            return cached[1:]
+
+        corners, tcoords, owners = [], [], []
+        for index, polydata in enumerate(polydatas):
+            polys = polydata.GetPolys()
+            if polys.GetNumberOfCells() == 0 or polys.IsHomogeneous() != 4:
+                print("The NumPy renderer only draws quads, skipping a mesh")
+                continue
+            cells = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 4)
+            points = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData()).astype(numpy.float64)
+            corners.append(points[cells])
+            tcoords.append(numpy_support.vtk_to_numpy(polydata.GetPointData().GetTCoords())[cells])
+            owners += [index] * len(cells)
+        if not corners:
+            self.quads[cube] = (versions, None, None, None, None)
+            return None, None, None, None
+
+        corners = numpy.concatenate(corners)
+        tcoords = numpy.concatenate(tcoords).astype(numpy.float64)
+        # Face winding differs between faces, so outward is away from the middle of the cube
+        normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 3] - corners[:, 0])
+        outward = corners.mean(axis=1) - corners.reshape(-1, 3).mean(axis=0)
+        normals *= numpy.where(numpy.einsum("ij,ij->i", normals, outward) < 0, -1.0, 1.0)[:, None]
+        self.quads[cube] = (versions, corners, tcoords, normals, numpy.array(owners))
+        return corners, tcoords, normals, numpy.array(owners)
+
+    # Function to return a texture's (width, height, texels), repacked only when it changes. One uint32 per
+    # texel means each lookup fetches a single element, which is several times faster than gathering rows.
+    def texture_texels(self, texture):
+        image = texture.GetInput()
+        cached = self.textures.get(id(image))
+        if cached is not None and cached[0] is image and cached[1] == image.GetMTime():
+            return cached[2:]
+        width, height, _ = image.GetDimensions()
+        scalars = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars()).reshape(width * height, -1)
+        texels = numpy.zeros((width * height, 4), dtype=numpy.uint8)
+        if scalars.shape[1] < 3:
+            texels[:, :3] = scalars[:, :1]  # Grayscale
+        else:
+            texels[:, :3] = scalars[:, :3]  # Alpha is ignored, the cube's images are opaque
+        texels = texels.view(numpy.uint32).ravel()
+        self.textures[id(image)] = (image, image.GetMTime(), width, height, texels)
+        return width, height, texels
+
+    # Function to draw the scene and return the frame as a (height, width, 3) uint8 array, top row first.
+    # With a region (x, y, width, height), in pixels from the top left, only that part of the frame is drawn.
+    # Every pixel is worked out from its position in the whole frame, so it comes out exactly the same.
+    def render(self, region=None):
+        scene = self.scene
+        if scene.camera_stale:
+            scene.reset_camera()  # No renderer StartEvent on this path
+        if scene.culler is not None:
+            scene.culler.update()
+        width, height = scene.render_window.GetSize()
+        renderer = scene.renderer
+        camera = renderer.GetActiveCamera()
+
+        left, top, region_width, region_height = region or (0, 0, width, height)
+        self.origin = (left, top)
+        if self.frame is None or self.frame.shape != (region_height, region_width):
+            self.frame = numpy.empty((region_height, region_width), dtype=numpy.uint32)
+            self.depth = numpy.empty((region_height, region_width), dtype=numpy.float32)
+        background = numpy.array([round(channel * 255) for channel in renderer.GetBackground()] + [0], numpy.uint8)
+        self.frame.fill(background.view(numpy.uint32)[0])
+        self.depth.fill(numpy.inf)
+
+        # Clip space to pixels, keeping the homogeneous w: (x * w, y * w, w) with row 0 at the top
+        to_pixels = numpy.array([[width / 2, 0, 0, width / 2 - 0.5],
+                                 [0, -height / 2, 0, height / 2 - 0.5],
+                                 [0, 0, 0, 1]])
+        projection = to_pixels @ matrix_to_numpy(camera.GetCompositeProjectionTransformMatrix(width / height, -1, 1))
+        view_depth = -matrix_to_numpy(camera.GetViewTransformMatrix())[2]  # Distance in front of the camera
+        camera_position = numpy.array(camera.GetPosition())
+        direction = numpy.array(camera.GetDirectionOfProjection())
+        parallel = camera.GetParallelProjection()
+
+        for cube in scene.cubes:
+            if not getattr(cube, "visible", False) or not getattr(cube, "actors", None):
+                continue
+            corners, tcoords, normals, owners = self.cube_quads(cube)
+            if corners is None:
+                continue
+            model = matrix_to_numpy(cube.transform.GetMatrix())
+
+            # Back-face rejection: only faces whose outside points at the camera are drawn
+            world_normals = normals @ model[:3, :3].T
+            if parallel:
+                facing = world_normals @ direction < 0
+            else:
+                world_corners = corners[:, 0] @ model[:3, :3].T + model[:3, 3]
+                facing = numpy.einsum("ij,ij->i", world_normals, world_corners - camera_position) < 0
+
+            # Headlight with two-sided lighting, as VTK's default light: diffuse only, one value per flat face
+            shading = numpy.abs(world_normals @ direction) / numpy.linalg.norm(world_normals, axis=1)
+
+            transform = numpy.vstack([projection @ model, view_depth @ model])
+            screen = numpy.concatenate([corners, numpy.ones(corners.shape[:2] + (1,))], axis=2) @ transform.T
+            for quad in numpy.flatnonzero(facing):
+                actor = cube.actors[owners[quad]]
+                if actor.GetTexture() is None:
+                    continue
+                self.draw_quad(screen[quad], tcoords[quad], shading[quad], actor.GetTexture())
+        self.pixels = numpy.ascontiguousarray(
+            self.frame.view(numpy.uint8).reshape(region_height, region_width, 4)[:, :, :3])
+        return self.pixels
+
+    # Function to draw one quad given its corners as (x * w, y * w, w, depth) and texture coordinates
+    def draw_quad(self, screen, tcoords, shading, texture):
+        if screen[:, 2].min() <= 1e-9:
+            return  # Crosses the camera plane; cubes there fill the view and are not drawn
+        height, width = self.depth.shape
+        origin_x, origin_y = self.origin
+        xs = screen[:, 0] / screen[:, 2]
+        ys = screen[:, 1] / screen[:, 2]
+        x0, x1 = max(int(math.floor(xs.min())), origin_x), min(int(math.ceil(xs.max())), origin_x + width - 1)
+        y0, y1 = max(int(math.floor(ys.min())), origin_y), min(int(math.ceil(ys.max())), origin_y + height - 1)
+        if x0 > x1 or y0 > y1:
+            return
+
+        # The face is origin + s * edge1 + t * edge2; pixels map back to (s, t) through the inverse projection
+        edge1 = screen[1] - screen[0]
+        edge2 = screen[3] - screen[0]
+        try:
+            inverse = numpy.linalg.inv(numpy.column_stack([edge1[:3], edge2[:3], screen[0, :3]]))
+        except numpy.linalg.LinAlgError:
+            return  # Seen edge on
+        inverse = inverse.astype(numpy.float32)  # Single precision is plenty for pixels and texels
+        px = numpy.arange(x0, x1 + 1, dtype=numpy.float32)[None, :]
+        py = numpy.arange(y0, y1 + 1, dtype=numpy.float32)[:, None]
+        w = inverse[2, 0] * px + inverse[2, 1] * py + inverse[2, 2]  # 1 / w
+        with numpy.errstate(divide="ignore", invalid="ignore"):  # Pixels on the plane's horizon fail the mask
+            s = (inverse[0, 0] * px + inverse[0, 1] * py + inverse[0, 2]) / w
+            t = (inverse[1, 0] * px + inverse[1, 1] * py + inverse[1, 2]) / w
+        depth = numpy.float32(screen[0, 3]) + s * numpy.float32(edge1[3]) + t * numpy.float32(edge2[3])
+        depth_buffer = self.depth[y0 - origin_y:y1 - origin_y + 1, x0 - origin_x:x1 - origin_x + 1]
+        mask = (s >= 0) & (s <= 1) & (t >= 0) & (t <= 1) & (depth < depth_buffer)
+        if not mask.any():
+            return
+        depth_buffer[mask] = depth[mask]
+        s = s[mask]
+        t = t[mask]
+
+        # Bilinear texture lookup, as the cube's textures interpolate; coordinates are clamped at the edges
+        texture_width, texture_height, texels = self.texture_texels(texture)
+        u = (tcoords[0, 0] + s * (tcoords[1, 0] - tcoords[0, 0]) + t * (tcoords[3, 0] - tcoords[0, 0]))
+        v = (tcoords[0, 1] + s * (tcoords[1, 1] - tcoords[0, 1]) + t * (tcoords[3, 1] - tcoords[0, 1]))
+        u = numpy.clip(u * texture_width - 0.5, 0, texture_width - 1)
+        v = numpy.clip(v * texture_height - 0.5, 0, texture_height - 1)
+        u0 = u.astype(numpy.intp)
+        v0 = v.astype(numpy.intp)
+        u1 = numpy.minimum(u0 + 1, texture_width - 1)
+        v1 = numpy.minimum(v0 + 1, texture_height - 1)
+        fu = (u - u0).astype(numpy.float32)[:, None]
+        fv = (v - v0).astype(numpy.float32)[:, None]
+        row0 = v0 * texture_width
+        row1 = v1 * texture_width
+
+        def fetch(index):
+            return texels.take(index).view(numpy.uint8).reshape(-1, 4).astype(numpy.float32)
+
+        # a + (b - a) * f, in place to keep the temporaries down
+        color = fetch(row0 + u0)
+        right = fetch(row0 + u1)
+        right -= color
+        right *= fu
+        color += right
+        top = fetch(row1 + u0)
+        right = fetch(row1 + u1)
+        right -= top
+        right *= fu
+        top += right
+        top -= color
+        top *= fv
+        color += top
+        color *= numpy.float32(shading)
+        color += numpy.float32(0.5)
+        frame = self.frame[y0 - origin_y:y1 - origin_y + 1, x0 - origin_x:x1 - origin_x + 1]
+        frame[mask] = color.astype(numpy.uint8).view(numpy.uint32).ravel()
+
+    # Function to return the last frame as VTK image data (bottom row first), e.g. for a vtkPNGWriter
+    def vtk_image(self):
+        height, width, _ = self.pixels.shape
+        self.image.SetDimensions(width, height, 1)
+        scalars = numpy_support.numpy_to_vtk(numpy.ascontiguousarray(self.pixels[::-1]).reshape(-1, 3), deep=True)
+        self.image.GetPointData().SetScalars(scalars)
+        self.image.Modified()
+        return self.image
+
+
+# The renderer, window and timer shared by every cube in the scene
+class CubeScene:
+    def __init__(self, width=800, height=600, background=(0.1, 0.2, 0.4)):
+        self.cubes = []
+
+        # Set up the rendering environment
+        self.renderer = vtkRenderer()
+        self.renderer.SetBackground(*background)  # Default background color: dark blue
+
+        # Set up the camera to focus on the center of the scene
+        self.camera = vtkCamera()
+        self.camera.SetPosition(2, 2, 2)  # Set a position that views the cube from a diagonal angle
+        self.camera.SetFocalPoint(0, 0, 0)  # Focus on the cube's center
+        self.camera.SetViewUp(0, 0, 1)  # Ensure the camera's up direction is consistent
+        self.renderer.SetActiveCamera(self.camera)
+
+        self.render_window = vtkRenderWindow()
+        self.render_window.AddRenderer(self.renderer)
+        self.render_window.SetSize(width, height)
+
+        # The camera frames the cubes once before the next frame, however many were added, as resetting it
+        # for every cube makes building a large scene quadratic
+        self.camera_stale = False
+        self.renderer.AddObserver("StartEvent", self.render_started, 1.0)  # Before the culler looks at the view
+
+        # Frame timing, used to check that texture swap frames cost the same as normal frames
+        self.frame_times = deque(maxlen=360)  # Most recent frame times in seconds
+
+        # Animation speed follows wall time; rendering is capped at the display refresh rate
+        self.clock = AnimationClock()
+        self.max_fps = 60
+        self.adaptive_timer = True  # Stretch the timer interval when frames take longer than a refresh
+        self.render_window_interactor = None
+        self.timer_id = None
+
+        # Only render when something changed; while paused and idle no timer runs at all
+        self.paused = False
+        self.dirty = True
+
+        # Per-face texture swaps are spread out so a single frame never uploads more than this many faces' worth
+        # of textures. An atlas cube counts as the faces its atlas holds, and goes ahead whenever any of the
+        # budget is left, so it is never starved.
+        self.max_face_uploads_per_frame = 1
+        self.next_face_swap_cube = 0  # Round robin over cubes so none of them starves
+
+        # Video textures advance with simulation time, so they pause with the animation
+        self.videos = []
+        self.simulation_time = 0.0
+        self.wait_for_video_frames = False  # Headless renders wait for each frame instead of dropping it
+
+        # Per-phase frame timings, toggled with the "i" key
+        self.profiler = FrameProfiler()
+        self.profiler.attach(self.renderer, self.render_window)
+
+        # Batches of commands from other threads (e.g. the control server), applied on the render thread
+        # between frames. SimpleQueue.put never waits for the render thread, so senders are never held up.
+        self.commands = queue.SimpleQueue()
+        self.control_server = None
+        self.command_poll_ms = 50  # Timer interval while paused with a control server, to pick up commands
+        self.command_budget_ms = 2.0  # A backlog is spread over frames after this much time in one frame
+
+        # Optional frustum culling and texture level of detail (see enable_culling)
+        self.culler = None
+
+        # Optional MJPEG server that streams every rendered frame (see StreamServer)
+        self.stream_server = None
+
+        # Optional log of the session's input for replays (see SessionRecorder)
+        self.recorder = None
+
+        # Cubes still showing placeholder colors on some faces while their images decode (see defer_textures)
+        self.loading_cubes = []
+        self.rebuilding_cubes = []  # Cubes given new images by a command, waiting for the first one to decode
+        self.first_frame_seconds = None  # Start-up to the first frame
+        self.textures_loaded_seconds = None  # Start-up to the last placeholder being replaced
+
+    # Function to add a cube to the scene
+    def add_cube(self, cube):
+        self.cubes.append(cube)
+        cube.add_to(self.renderer)
+        self.camera_stale = True
+        if getattr(cube, "loading_faces", None):
+            self.loading_cubes.append(cube)
+        if self.culler is not None:
+            self.culler.stale = True
+        return cube
+
+    # Function to point the camera at every cube, or at the given bounds
+    def reset_camera(self, bounds=None):
+        if bounds is None:
+            self.renderer.ResetCamera()
+        else:
+            self.renderer.ResetCamera(bounds)
+        self.camera_stale = False
+
+    # Renderer start: frame the cubes added since the camera was last reset
+    def render_started(self, obj, event):
+        if self.camera_stale:
+            self.reset_camera()
+
+    # Function to hide cubes outside the view and give far away cubes smaller textures
+    def enable_culling(self, lod_bias=1.0, max_lod=4):
+        if self.culler is None:
+            self.culler = CubeCuller(self, lod_bias, max_lod)
+        return self.culler
+
+    # Function to advance every cube by one timer tick, returns True if any cube swapped textures
+    def tick(self):
+        swapped = False
+        if not self.profiler.enabled:
+            for cube in self.cubes:
+                swapped = cube.tick() or swapped
+            return swapped
+
+        for cube in self.cubes:
+            start = time.perf_counter()
+            cube_swapped = cube.tick()
+            self.profiler.add("texture" if cube_swapped else "transform", time.perf_counter() - start)
+            swapped = cube_swapped or swapped
+        return swapped
+
+    # Function to apply the queued per-face texture swaps allowed for this frame, returns True if any ran
+    def apply_face_swaps(self):
+        budget = self.max_face_uploads_per_frame
+        start = time.perf_counter()
+        for offset in range(len(self.cubes)):
+            if budget <= 0:
+                break
+            cube = self.cubes[(self.next_face_swap_cube + offset) % len(self.cubes)]
+            applied = cube.apply_face_swaps(budget) if hasattr(cube, "apply_face_swaps") else 0
+            if applied:
+                budget -= applied
+                self.next_face_swap_cube = (self.next_face_swap_cube + offset + 1) % len(self.cubes)
+
+        applied = budget < self.max_face_uploads_per_frame
+        if applied and self.profiler.enabled:
+            self.profiler.add("texture", time.perf_counter() - start)
+        return applied
+
+    # Function to put newly decoded textures on faces still showing placeholder colors and on cubes given new
+    # images, or with wait, all of them. Returns True if any face changed. rebuild, if given, lists the only
+    # cubes that may rebuild, so a replay rebuilds each one in the tick the recording did.
+    def apply_loaded_textures(self, wait=False, rebuild=None):
+        rebuilt = False
+        for cube in self.rebuilding_cubes:
+            if rebuild is not None and cube not in rebuild:
+                continue
+            if cube.apply_loaded_textures(wait):
+                rebuilt = True
+                if self.recorder is not None:
+                    self.recorder.rebuild(self.cubes.index(cube), False)
+        self.rebuilding_cubes = [cube for cube in self.rebuilding_cubes if cube.rebuild_pending]
+
+        changed = False
+        for cube in self.loading_cubes:
+            changed = cube.apply_loaded_textures(wait) or changed
+        self.loading_cubes = [cube for cube in self.loading_cubes if cube.loading_faces]
+        if changed and not self.loading_cubes:
+            self.textures_loaded_seconds = time.perf_counter() - startup_time
+            print(f"All textures loaded {self.textures_loaded_seconds * 1000:.0f} ms after start")
+        return changed or rebuilt
+
+    # Function to note how long after start-up the first frame was shown
+    def record_first_frame(self):
+        if self.first_frame_seconds is None:
+            self.first_frame_seconds = time.perf_counter() - startup_time
+            print(f"First frame {self.first_frame_seconds * 1000:.0f} ms after start")
+
+    # Function to show the first frame and render as the loop would until every texture is on screen, then
+    # return the start-up times in ms
+    def measure_startup(self, timeout=60.0):
+        self.render_window.Render()
+        self.record_first_frame()
+        deadline = time.perf_counter() + timeout
+        while self.loading_cubes and time.perf_counter() < deadline:
+            if self.apply_loaded_textures():
+                self.render_window.Render()
+            else:
+                time.sleep(0.001)  # Let the decoder thread run
+        if not self.loading_cubes and self.textures_loaded_seconds is None:
+            self.textures_loaded_seconds = self.first_frame_seconds  # The first frame had every texture
+        textures_ms = self.textures_loaded_seconds * 1000 if self.textures_loaded_seconds is not None else None
+        return {"first_frame_ms": round(self.first_frame_seconds * 1000, 1),
+                "textures_ms": round(textures_ms, 1) if textures_ms is not None else None}
+
+    # Function to add a video texture that the scene keeps in step with the animation
+    def add_video(self, video):
+        self.videos.append(video)
+        return video
+
+    # Function to run a number of simulation steps and the face swaps due for the next frame
+    def advance(self, steps):
+        swapped = False
+        for _ in range(steps):
+            swapped = self.tick() or swapped
+        if self.apply_face_swaps():
+            swapped = True
+
+        self.simulation_time += steps * simulation_step_ms / 1000
+        for video in self.videos:
+            start = time.perf_counter()
+            if video.update(self.simulation_time, wait=self.wait_for_video_frames) and self.profiler.enabled:
+                self.profiler.add("texture", time.perf_counter() - start)
+        return swapped
+
+    # Function to handle key press events for translation
+    def keypress_callback(self, obj, event):
+        key = obj.GetKeySym()
+        if self.recorder is not None:
+            self.recorder.key(key)
+        self.handle_key(key)
+
+    # Function to act on a key: arrows and w/s move the cubes, space pauses, i toggles the profiler
+    def handle_key(self, key):
+        if key == "i":
+            self.profiler.toggle()
+            self.request_render()
+            return
+        if key == "space":
+            self.set_paused(not self.paused)
+            return
+
+        moves = {
+            "Left": (-0.1, 0.0, 0.0),
+            "Right": (0.1, 0.0, 0.0),
+            "Up": (0.0, 0.1, 0.0),
+            "Down": (0.0, -0.1, 0.0),
+            "w": (0.0, 0.0, 0.1),
+            "s": (0.0, 0.0, -0.1),
+        }
+        if key not in moves:
+            return
+
+        self.move_cubes(*moves[key])
+        self.request_render()
+
+        if self.cubes:
+            print(f"Translation updated to: {self.cubes[0].translation}")
+
+    # Function to move cubes (all of them by default)
+    def move_cubes(self, dx, dy, dz, cubes=None):
+        for cube in self.cubes if cubes is None else cubes:
+            cube.translate(dx, dy, dz)
+            if self.paused and hasattr(cube, "update_transform"):
+                cube.update_transform()  # rotate_cube() is not running to pick up the new translation
+        if self.culler is not None:
+            if cubes is None:
+                self.culler.moved_all(dx, dy, dz)
+            else:
+                self.culler.stale = True
+
+    # Function to apply the command batches queued by other threads, returns how many commands ran
+    def apply_commands(self):
+        applied = 0
+        deadline = time.perf_counter() + self.command_budget_ms / 1000
+        for _ in range(self.commands.qsize()):  # Only what is queued now, so a flood cannot stall the frame
+            batch = self.commands.get_nowait()
+            if self.recorder is not None:
+                self.recorder.commands(batch)
+            for command in batch:
+                self.apply_command(command)
+            applied += len(batch)
+            if time.perf_counter() > deadline:
+                self.dirty = True  # The rest waits for the next frame
+                break
+        return applied
+
+    # Function to apply one command checked by parse_control_command()
+    def apply_command(self, command):
+        cubes = self.cubes
+        if command.get("cube") is not None:
+            if not 0 <= command["cube"] < len(self.cubes):
+                print(f"Control command for cube {command['cube']}, but there are {len(self.cubes)} cubes")
+                return
+            cubes = [self.cubes[command["cube"]]]
+
+        name = command["cmd"]
+        if name == "translate":
+            self.move_cubes(*command["by"], cubes=cubes)
+        elif name == "rotation_speed":
+            for cube in cubes:
+                if hasattr(cube, "set_rotation_speed"):
+                    cube.set_rotation_speed(*command["speed"])
+        elif name == "angular_velocity":
+            for cube in cubes:
+                if hasattr(cube, "set_angular_velocity"):
+                    cube.set_angular_velocity(command["axis"], command["speed"])
+        elif name == "pivot":
+            for cube in cubes:
+                if hasattr(cube, "set_pivot"):
+                    cube.set_pivot(*command["at"])
+            if self.culler is not None:
+                self.culler.stale = True  # The cubes now sweep different spheres
+        elif name == "orient":
+            orientation = quaternion_from_axis_angle(command["axis"], command["angle"])
+            for cube in cubes:
+                if hasattr(cube, "turn_to"):
+                    cube.turn_to(orientation, command["seconds"])
+        elif name == "images":
+            for cube in cubes:
+                if hasattr(cube, "set_images_to_cycle"):
+                    cube.set_images_to_cycle(command["images"])
+                    if cube.rebuild_pending:
+                        if cube not in self.rebuilding_cubes:
+                            self.rebuilding_cubes.append(cube)
+                    elif self.recorder is not None:
+                        self.recorder.rebuild(self.cubes.index(cube), True)  # The first image was already decoded
+        elif name == "pause":
+            self.set_paused(not self.paused if command["paused"] is None else command["paused"])
+        self.dirty = True
+
+    # Function to mark the scene as changed; renders are coalesced to at most one per timer interval
+    def request_render(self):
+        self.dirty = True
+        if self.render_window_interactor is not None and self.adaptive_timer and self.timer_id is None:
+            self.timer_id = self.render_window_interactor.CreateOneShotTimer(self.next_timer_interval())
+
+    # Function to pause or resume the animation
+    def set_paused(self, paused):
+        self.paused = paused
+        self.clock.last_time = None  # Time spent paused does not count towards the animation
+        if not paused:
+            self.request_render()  # Restarts the timer chain
+        print("Animation paused" if paused else "Animation resumed")
+
+    # Function to work out the next timer interval in ms
+    def next_timer_interval(self):
+        interval = 1000 / self.max_fps
+        if self.adaptive_timer and self.frame_times:
+            # Do not ask for frames faster than we have recently been able to produce them
+            recent = list(self.frame_times)[-10:]
+            interval = max(interval, 1000 * sum(recent) / len(recent))
+        return max(1, int(round(interval)))
+
+    # Timer callback for both rotation and texture update of every cube
+    def timer_callback(self, obj, event):
+        # Interactor styles fire their own timer events, only react to ours
+        if obj.GetTimerEventId() != self.timer_id:
+            return
+        if self.adaptive_timer:
+            self.timer_id = None  # The one-shot timer has fired
+        try:
+            self.apply_commands()
+
+            frame_start = time.perf_counter()
+            profiling = self.profiler.enabled
+            if profiling:
+                self.profiler.begin_frame()
+
+            # Run as many fixed simulation steps as wall time requires, then render once
+            steps = 0 if self.paused else self.clock.steps_due()
+            swap_frame = self.advance(steps) if steps else False
+            if steps:
+                self.dirty = True
+            if (self.loading_cubes or self.rebuilding_cubes) and self.apply_loaded_textures():
+                self.dirty = True
+
+            rendered = self.dirty
+            if self.dirty:
+                self.dirty = False
+                self.render_window.Render()
+                if profiling:
+                    self.profiler.end_frame()
+                if self.stream_server is not None:
+                    self.stream_server.publish()
+
+                frame_time = time.perf_counter() - frame_start
+                if swap_frame and self.frame_times:
+                    average_frame_time = sum(self.frame_times) / len(self.frame_times)
+                    print(f"Swap frame: {frame_time * 1000:.2f} ms "
+                          f"(average frame: {average_frame_time * 1000:.2f} ms)")
+                self.frame_times.append(frame_time)
+            if self.recorder is not None:
+                self.recorder.tick(steps, rendered)
+        finally:
+            # Keep ticking while animating, even after an error in this tick; when paused the next input
+            # starts a new timer
+            if self.adaptive_timer and self.timer_id is None:
+                if not self.paused:
+                    self.timer_id = obj.CreateOneShotTimer(self.next_timer_interval())
+                elif self.control_server is not None or self.loading_cubes or self.rebuilding_cubes:
+                    # Other threads cannot start a timer, so keep polling for their commands and textures
+                    self.timer_id = obj.CreateOneShotTimer(self.command_poll_ms)
+
+    # Start the rendering loop
+    def start_render_loop(self):
+        self.render_window.Render()
+        self.record_first_frame()
+
+        self.render_window_interactor = vtkRenderWindowInteractor()
+        self.render_window_interactor.SetRenderWindow(self.render_window)
+        self.render_window_interactor.Initialize()
+        self.render_window_interactor.AddObserver("TimerEvent", self.timer_callback)
+        self.render_window_interactor.AddObserver("KeyPressEvent", self.keypress_callback)  # Add keypress event
+        if self.adaptive_timer:
+            self.timer_id = self.render_window_interactor.CreateOneShotTimer(self.next_timer_interval())
+        else:
+            self.timer_id = self.render_window_interactor.CreateRepeatingTimer(self.next_timer_interval())
+        self.render_window_interactor.Start()
+
+    # Render the animation offscreen (no display needed) and stream every frame to disk or an encoder.
+    # The "numpy" backend draws frames with SoftwareRenderer instead of OpenGL, for machines without a GPU.
+    def render_headless(self, output_pattern="frames/frame_%05d.png", fps=30, duration=10.0, encoder_command=None,
+                        backend="vtk"):
+        self.render_window.SetOffScreenRendering(1)
+        self.wait_for_video_frames = True  # Offline output should not drop video frames
+        self.apply_loaded_textures(wait=True)  # And should not show placeholders
+        width, height = self.render_window.GetSize()
+
+        software = None
+        if backend == "numpy":
+            software = SoftwareRenderer(self)
+        elif backend != "vtk":
+            raise ValueError(f"Unknown render backend: {backend}")
+
+        # Capture the back buffer of the offscreen window after every render
+        window_to_image = vtkWindowToImageFilter()
+        window_to_image.SetInput(self.render_window)
+        window_to_image.SetInputBufferTypeToRGB()
+        window_to_image.ReadFrontBufferOff()
+        window_to_image.ShouldRerenderOff()  # Each frame is rendered below, reading it back must not render again
+
+        encoder = None
+        writer = None
+        if encoder_command:
+            # Raw RGB frames go to the encoder's stdin, top row first
+            flip = vtkImageFlip()
+            flip.SetInputData(window_to_image.GetOutput())
+            flip.SetFilteredAxis(1)
+            command = shlex.split(encoder_command.format(width=width, height=height, fps=fps))
+            encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            encoder_errors = deque(maxlen=20)  # Its last lines of output, for the error if it fails
+            relay = threading.Thread(target=relay_output, args=(encoder.stderr, encoder_errors), daemon=True)
+            relay.start()
+        else:
+            output_dir = os.path.dirname(output_pattern)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            writer = vtkPNGWriter()
+            if software is not None:
+                writer.SetInputData(software.image)
+            else:
+                writer.SetInputConnection(window_to_image.GetOutputPort())
+
+        # Keep the same angular speed as the interactive loop
+        ticks_per_frame = 1000 / simulation_step_ms / fps
+        frame_count = int(round(fps * duration))
+        ticks_done = 0
 
-# Function to create a textured face for a cube
-def create_textured_face(image_path, origin, point1, point2):
-    if not os.path.exists(image_path):
-        print(f"Image not found: {image_path}")
-        return None
+        frames_written = 0
+        start = time.perf_counter()
+        try:
+            for frame in range(frame_count):
+                profiling = self.profiler.enabled
+                if profiling:
+                    self.profiler.begin_frame()
+                steps = round((frame + 1) * ticks_per_frame) - ticks_done
+                self.apply_commands()
+                self.advance(steps)
+                ticks_done += steps
+                if software is not None:
+                    pixels = software.render()
+                else:
+                    self.render_window.Render()
+                if profiling:
+                    self.profiler.end_frame()
+                window_to_image.Modified()
 
-    reader = vtk.vtkJPEGReader()
-    reader.SetFileName(image_path)
+                if self.stream_server is not None:
+                    self.stream_server.publish(software.vtk_image() if software is not None else None)
 
-    texture = vtk.vtkTexture()
-    texture.SetInputConnection(reader.GetOutputPort())
-    texture.InterpolateOn()
+                if software is not None:
+                    if encoder is not None:
+                        encoder.stdin.write(memoryview(pixels))
+                    else:
+                        software.vtk_image()
+                        writer.SetFileName(output_pattern % frame)
+                        writer.Write()
+                elif encoder is not None:
+                    window_to_image.Update()
+                    flip.Modified()
+                    flip.Update()
+                    encoder.stdin.write(memoryview(flip.GetOutput().GetPointData().GetScalars()))
+                else:
+                    writer.SetFileName(output_pattern % frame)
+                    writer.Write()
+                frames_written += 1
+        except BrokenPipeError:
+            pass  # The encoder stopped reading, which is reported below
+        finally:
+            if encoder is not None:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+                encoder.wait()
+                relay.join()
 
-    plane = vtk.vtkPlaneSource()
-    plane.SetOrigin(*origin)
-    plane.SetPoint1(*point1)
-    plane.SetPoint2(*point2)
+        if encoder is not None and (encoder.returncode != 0 or frames_written < frame_count):
+            raise RuntimeError(f"Encoder {command[0]} exited with status {encoder.returncode} after "
+                               f"{frames_written} of {frame_count} frames" +
+                               (":\n" + "\n".join(encoder_errors) if encoder_errors else ""))
 
-    mapper = vtk.vtkPolyDataMapper()
-    mapper.SetInputConnection(plane.GetOutputPort())
+        elapsed = time.perf_counter() - start
+        achieved_fps = frame_count / elapsed if elapsed > 0 else 0.0
+        print(f"Rendered {frame_count} frames at {width}x{height} in {elapsed:.2f} s ({achieved_fps:.1f} frames/s)")
+        return achieved_fps
 
-    actor = vtk.vtkActor()
-    actor.SetMapper(mapper)
-    actor.SetTexture(texture)
 
-    return actor
+# Function to copy a child process's output to our stderr as it comes, keeping its last lines in tail
+def relay_output(stream, tail):
+    with stream:
+        for line in stream:
+            sys.stderr.buffer.write(line)
+            sys.stderr.flush()
+            tail.append(line.decode(errors="replace").rstrip())
 
 
-# Define cube face coordinates and initial images
-cube_faces = [
-    {"image": "", "origin": [-0.5, -0.5, -0.5], "point1": [0.5, -0.5, -0.5], "point2": [-0.5, 0.5, -0.5]},
-    {"image": "", "origin": [-0.5, -0.5, 0.5], "point1": [0.5, -0.5, 0.5], "point2": [-0.5, 0.5, 0.5]},
-    {"image": "", "origin": [-0.5, -0.5, -0.5], "point1": [-0.5, 0.5, -0.5], "point2": [-0.5, -0.5, 0.5]},
-    {"image": "", "origin": [0.5, -0.5, -0.5], "point1": [0.5, 0.5, -0.5], "point2": [0.5, -0.5, 0.5]},
-    {"image": "", "origin": [-0.5, 0.5, -0.5], "point1": [0.5, 0.5, -0.5], "point2": [-0.5, 0.5, 0.5]},
-    {"image": "", "origin": [-0.5, -0.5, -0.5], "point1": [0.5, -0.5, -0.5], "point2": [-0.5, -0.5, 0.5]},
-]
+# Function to check a remote control command and return it normalized (raises ValueError if it is invalid)
+def parse_control_command(command):
+    if not isinstance(command, dict) or "cmd" not in command:
+        raise ValueError('expected an object with a "cmd" field')
+    cube = command.get("cube")
+    if cube is not None and (not isinstance(cube, int) or isinstance(cube, bool)):
+        raise ValueError('"cube" must be a cube index')
 
-# List of images to cycle through
-images_to_cycle = ["harambee_logo2.jpg", "amentum.jpg"]
-current_image_index = 0  # Start with the first image
-
-# Translation parameters
-translation = [0.0, 0.0, 0.0]  # Initial translation values
-
-# Set up the rendering environment
-renderer = vtk.vtkRenderer()
-renderer.SetBackground(0.1, 0.2, 0.4)  # Background color: dark blue
-
-# Create a list of actors for the cube faces
-actors = []
-for face in cube_faces:
-    face["image"] = images_to_cycle[current_image_index]
-    actor = create_textured_face(face["image"], face["origin"], face["point1"], face["point2"])
-    if actor:
-        actors.append(actor)
-        renderer.AddActor(actor)
-
-# Set up the camera to focus on the center of the cube
-camera = vtk.vtkCamera()
-camera.SetPosition(2, 2, 2)  # Set a position that views the cube from a diagonal angle
-camera.SetFocalPoint(0, 0, 0)  # Focus on the cube's center
-camera.SetViewUp(0, 0, 1)  # Ensure the camera's up direction is consistent
-renderer.SetActiveCamera(camera)
-renderer.ResetCamera()
-
-render_window = vtk.vtkRenderWindow()
-render_window.AddRenderer(renderer)
-render_window.SetSize(800, 600)
-
-render_window_interactor = vtk.vtkRenderWindowInteractor()
-render_window_interactor.SetRenderWindow(render_window)
-
-# Transform for rotating and translating the cube
-transform = vtk.vtkTransform()
-angle_x = 0
-angle_y = 0
-angle_z = 0
-
-# Function to update textures
-def update_textures():
-    global current_image_index
-
-    current_image_index = (current_image_index + 1) % len(images_to_cycle)
-    new_image = images_to_cycle[current_image_index]
-
-    for i, actor in enumerate(actors):
-        reader = vtk.vtkJPEGReader()
-        if not os.path.exists(new_image):
-            print(f"Image not found: {new_image}")
-            continue
-
-        reader.SetFileName(new_image)
-        texture = vtk.vtkTexture()
-        texture.SetInputConnection(reader.GetOutputPort())
-        texture.InterpolateOn()
-        texture.Update()
+    def number(field, default=None):
+        value = command.get(field, default)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f'"{field}" must be a number')
+        return float(value)
 
-        actor.SetTexture(texture)
+    def vector(field):
+        value = command.get(field)
+        if (not isinstance(value, list) or len(value) != 3
+                or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+            raise ValueError(f'"{field}" must be a list of 3 numbers')
+        return [float(v) for v in value]
 
-    print(f"Updated cube textures to image: {new_image}")
-
-# Function to rotate the cube
-def rotate_cube():
-    global angle_x, angle_y, angle_z
-
-    # Increment rotation angles
-    angle_x = (angle_x + 1) % 360
-    angle_y = (angle_y + 1) % 360
-    angle_z = (angle_z + 1) % 360
-
-    transform.Identity()
-    transform.Translate(*translation)  # Apply translation to the cube
-    transform.RotateX(angle_x)
-    transform.RotateY(angle_y)
-    transform.RotateZ(angle_z)
-
-    for actor in actors:
-        actor.SetUserTransform(transform)
-
-# Function to handle key press events for translation
-def keypress_callback(obj, event):
-    global translation
-    key = obj.GetKeySym()
-
-    if key == "Left":
-        translation[0] -= 0.1
-    elif key == "Right":
-        translation[0] += 0.1
-    elif key == "Up":
-        translation[1] += 0.1
-    elif key == "Down":
-        translation[1] -= 0.1
-    elif key == "w":
-        translation[2] += 0.1
-    elif key == "s":
-        translation[2] -= 0.1
-
-    print(f"Translation updated to: {translation}")
-
-# Timer callback for both rotation and texture update
-def timer_callback(obj, event):
-    rotate_cube()
-    if angle_x % 360 == 0:  # Change texture every full rotation
-        update_textures()
-    render_window.Render()
+    name = command["cmd"]
+    if name == "translate":
+        return {"cmd": name, "cube": cube, "by": vector("by")}
+    if name == "rotation_speed":
+        return {"cmd": name, "cube": cube, "speed": vector("speed")}
+    if name == "angular_velocity":
+        return {"cmd": name, "cube": cube, "axis": vector("axis"), "speed": number("speed")}
+    if name == "pivot":
+        return {"cmd": name, "cube": cube, "at": vector("at")}
+    if name == "orient":
+        return {"cmd": name, "cube": cube, "axis": vector("axis"), "angle": number("angle"),
+                "seconds": number("seconds", 1.0)}
+    if name == "images":
+        images = command.get("images")
+        if not isinstance(images, list) or not images or not all(isinstance(image, str) for image in images):
+            raise ValueError('"images" must be a non-empty list of paths')
+        return {"cmd": name, "cube": cube, "images": images}
+    if name == "pause":
+        paused = command.get("paused")  # Leave it out to toggle
+        if paused is not None and not isinstance(paused, bool):
+            raise ValueError('"paused" must be true or false')
+        return {"cmd": name, "paused": paused}
+    raise ValueError(f"unknown command {name!r}")
 
-# Start the rendering loop
-def start_render_loop():
-    render_window.Render()
 
-    render_window_interactor.Initialize()
-    render_window_interactor.CreateRepeatingTimer(10)  # Timer interval in ms
-    render_window_interactor.AddObserver("TimerEvent", timer_callback)
-    render_window_interactor.AddObserver("KeyPressEvent", keypress_callback)  # Add keypress event
-    render_window_interactor.Start()
+# Base of the control and stream servers: an asyncio event loop on its own thread, serving connections on a
+# TCP or Unix socket address with the subclass's handle_client(). asyncio is imported by the methods that use
+# it, so a scene without a server does not spend start-up time importing it.
+class LoopServer:
+    line_limit = 64 * 1024  # Longest line a client's reader accepts in bytes (asyncio's default)
+
+    def __init__(self, scene, address):
+        self.scene = scene
+        self.address = address  # "HOST:PORT" (port 0 picks a free one) or "unix:PATH"
+        self.host, self.port = None, None
+        if not address.startswith("unix:"):
+            host, _, port = address.rpartition(":")
+            if not host or not port.isdigit() or int(port) > 65535:
+                raise ValueError(f"Server address must be HOST:PORT or unix:PATH, not {address!r}")
+            self.host, self.port = host, int(port)
+        self.bound_address = None
+        self.loop = None
+        self.server = None
+        self.error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    # Function to start listening in the background; raises OSError if the address cannot be used, or
+    # whatever else stopped the server thread from listening
+    def start(self):
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    # Background thread: run the event loop until close() is called
+    def run(self):
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(self.listen())
+        except Exception as error:  # Handed to start(), which would otherwise wait for ready forever
+            self.error = error
+            self.loop.close()
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+        self.server.close()
+        self.loop.close()
+
+    # Function to open the listening socket
+    async def listen(self):
+        import asyncio
+        if self.address.startswith("unix:"):
+            server = await asyncio.start_unix_server(self.handle_client, self.address[5:], limit=self.line_limit)
+            self.bound_address = self.address
+        else:
+            server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=self.line_limit)
+            self.bound_address = "%s:%d" % server.sockets[0].getsockname()[:2]
+        return server
+
+    # Function to stop the event loop and wait for its thread
+    def close(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+# Local control server: one JSON command, or a JSON list of commands applied in the same frame, per line.
+# It only ever hands checked commands to the scene's queue.
+class ControlServer(LoopServer):
+    line_limit = 1024 * 1024  # Longest accepted line (a batch) in bytes
+
+    def __init__(self, scene, address="127.0.0.1:8765"):
+        super().__init__(scene, address)
+        self.commands_received = 0
+
+    # Function to start listening in the background; raises OSError if the address cannot be used
+    def start(self):
+        super().start()
+        self.scene.control_server = self
+        print(f"Control server listening on {self.bound_address}")
+        return self
+
+    # Function to serve one client: every line gets a one-line JSON reply once its commands are queued
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    writer.write(json.dumps(self.handle_line(line)).encode() + b"\n")
+                    await writer.drain()
+        except (ConnectionError, ValueError) as error:  # ValueError: line longer than line_limit
+            print(f"Control client dropped: {error}")
+        finally:
+            writer.close()
+
+    # Function to check one line and queue its commands as a single batch
+    def handle_line(self, line):
+        try:
+            data = json.loads(line)
+            batch = [parse_control_command(command) for command in (data if isinstance(data, list) else [data])]
+        except ValueError as error:
+            return {"ok": False, "error": str(error)}
+        if batch:
+            self.scene.commands.put(batch)
+            self.commands_received += len(batch)
+        return {"ok": True, "queued": len(batch)}
+
+    # Function to stop the server
+    def close(self):
+        super().close()
+        if self.scene.control_server is self:
+            self.scene.control_server = None
+
+
+# Local HTTP server that streams the rendered frames as MJPEG to any number of viewers (GET /stream), or the
+# latest frame as one JPEG (GET /frame.jpg). Each frame is read back and JPEG-encoded once, on its own thread,
+# and the same bytes go to every viewer. A viewer only ever has the newest frame waiting for it, so slow
+# viewers skip frames instead of queueing them.
+class StreamServer(LoopServer):
+    boundary = b"cubeframe"
+
+    def __init__(self, scene, address="127.0.0.1:8080", quality=80, max_fps=30):
+        super().__init__(scene, address)
+        self.quality = quality
+        self.max_fps = max_fps  # Frames are read back at most this often, however fast the scene renders
+
+        # Render thread -> encoder thread: only the newest captured frame is kept
+        self.window_to_image = None
+        self.captured = None
+        self.captured_event = threading.Event()
+        self.last_capture = 0.0
+        self.encoder_thread = threading.Thread(target=self.encode_loop, daemon=True)
+        self.stop_event = threading.Event()
+
+        # Encoder thread -> viewers (on the event loop)
+        self.viewers = {}  # id -> {"part": frame waiting to be sent, "event", "writer", "dropped", "sent"}
+        self.part = None  # Latest frame as a complete multipart part
+        self.jpeg = None
+        self.frames_captured = 0
+        self.frames_encoded = 0
+
+    # Function to start serving in the background; raises OSError if the address cannot be used
+    def start(self):
+        super().start()
+        self.encoder_thread.start()
+        self.scene.stream_server = self
+        print(f"Streaming on http://{self.bound_address}/stream")
+        return self
+
+    # Function to capture the frame just rendered, if anyone is watching (called on the render thread).
+    # image can be VTK image data to stream instead of the render window, e.g. from SoftwareRenderer.
+    def publish(self, image=None):
+        if not self.viewers:
+            return
+        now = time.perf_counter()
+        if now - self.last_capture < 1.0 / self.max_fps:
+            return
+        self.last_capture = now
+
+        if image is None:
+            if self.window_to_image is None:
+                self.window_to_image = vtkWindowToImageFilter()
+                self.window_to_image.SetInput(self.scene.render_window)
+                self.window_to_image.SetInputBufferTypeToRGB()
+                self.window_to_image.ShouldRerenderOff()  # Read what was just drawn, do not draw again
+                self.window_to_image.SetReadFrontBuffer(not self.scene.render_window.GetOffScreenRendering())
+            self.window_to_image.Modified()
+            self.window_to_image.Update()
+            image = self.window_to_image.GetOutput()
+
+        # The copy is all the render thread pays for; encoding happens on the encoder thread
+        frame = vtkImageData()
+        frame.DeepCopy(image)
+        self.captured = frame  # Replaces a frame the encoder has not got to yet
+        self.frames_captured += 1
+        self.captured_event.set()
+
+    # Encoder thread: JPEG-encode the newest captured frame and hand it to the event loop
+    def encode_loop(self):
+        writer = vtkJPEGWriter()
+        writer.SetQuality(self.quality)
+        writer.WriteToMemoryOn()
+        while not self.stop_event.is_set():
+            if not self.captured_event.wait(timeout=0.1):
+                continue
+            self.captured_event.clear()
+            frame, self.captured = self.captured, None
+            if frame is None:
+                continue
+            writer.SetInputData(frame)
+            writer.Write()
+            jpeg = bytes(memoryview(writer.GetResult()))
+            part = (b"--" + self.boundary + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                    + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+            self.frames_encoded += 1
+            if self.loop.is_running():
+                self.loop.call_soon_threadsafe(self.fan_out, jpeg, part)
+
+    # Function to give every viewer the new frame (event loop thread); a frame a viewer has not sent yet is dropped
+    def fan_out(self, jpeg, part):
+        self.jpeg = jpeg
+        self.part = part
+        for viewer in self.viewers.values():
+            if viewer["part"] is not None:
+                viewer["dropped"] += 1
+            viewer["part"] = part
+            viewer["event"].set()
+
+    # Function to serve one HTTP request
+    async def handle_client(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # Headers are not needed
+            parts = request.split()
+            path = parts[1].decode(errors="replace").split("?")[0] if len(parts) > 1 else ""
+            if parts[:1] != [b"GET"]:
+                writer.write(b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            elif path in ("/", "/stream"):
+                await self.stream_to(writer)
+            elif path == "/frame.jpg" and self.jpeg is not None:
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n"
+                             b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n" % len(self.jpeg) + self.jpeg)
+            elif path == "/frame.jpg":
+                writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            else:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Viewers come and go
+        finally:
+            writer.close()
+
+    # Function to send frames to one viewer until it disconnects
+    async def stream_to(self, writer):
+        import asyncio
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=" + self.boundary
+                     + b"\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        viewer = {"part": self.part, "event": asyncio.Event(), "writer": writer, "dropped": 0, "sent": 0}
+        if viewer["part"] is not None:
+            viewer["event"].set()  # Show the latest frame straight away
+        self.viewers[id(viewer)] = viewer
+        try:
+            while True:
+                await viewer["event"].wait()
+                viewer["event"].clear()
+                part, viewer["part"] = viewer["part"], None
+                if part is None:
+                    break  # Woken up by close()
+                writer.write(part)
+                await writer.drain()  # Waits while the viewer's socket is full; newer frames replace part
+                viewer["sent"] += 1
+        finally:
+            del self.viewers[id(viewer)]
+
+    # Function to hang up on every viewer (event loop thread)
+    async def disconnect_all(self):
+        import asyncio
+        self.server.close()
+        for viewer in list(self.viewers.values()):
+            viewer["writer"].close()  # Also ends a drain() that is waiting on a slow viewer
+            viewer["part"] = None
+            viewer["event"].set()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=1.0)
+
+    # Function to stop the server and the encoder thread
+    def close(self):
+        self.stop_event.set()
+        if self.encoder_thread.is_alive():
+            self.encoder_thread.join()
+        if self.loop is not None and self.loop.is_running():
+            import asyncio
+            asyncio.run_coroutine_threadsafe(self.disconnect_all(), self.loop).result()
+        super().close()
+        if self.scene.stream_server is self:
+            self.scene.stream_server = None
+
+
+# Function to return what a session log checks after every tick: each cube's face images and translation
+def session_state(scene):
+    return [([face["image"] for face in getattr(cube, "faces", [])], list(getattr(cube, "translation", [])))
+            for cube in scene.cubes]
+
+# Function to list what changed since state (updating it): ("swap", cube, face, image) and ("move", cube, x, y, z)
+def session_changes(scene, state):
+    changes = []
+    for index, (images, translation) in enumerate(session_state(scene)):
+        if index >= len(state):
+            state.append(([None] * len(images), [None] * len(translation)))
+        old_images, old_translation = state[index]
+        for face, image in enumerate(images):
+            if image != old_images[face]:
+                changes.append(("swap", index, face, image))
+        if translation != old_translation:
+            changes.append(("move", index) + tuple(translation))
+        state[index] = (images, translation)
+    return changes
+
+# Function to read a session log, returns its settings and an iterator of (seconds, event, values, text)
+def read_session_log(path):
+    f = open(path, "rb")
+    if f.read(len(session_log_magic)) != session_log_magic:
+        f.close()
+        raise ValueError(f"{path} is not a session log")
+    (length,) = struct.unpack("<I", f.read(4))
+    settings = json.loads(f.read(length))
+
+    def records():
+        microseconds = 0
+        with f:
+            while True:
+                header = f.read(session_record_header.size)
+                if len(header) < session_record_header.size:
+                    return
+                delta, event = session_record_header.unpack(header)
+                microseconds += delta
+                payload = session_payloads[event]
+                values = payload.unpack(f.read(payload.size))
+                text = None
+                if event in (session_key, session_commands, session_image):
+                    text = f.read(values[-1]).decode()
+                    values = values[:-1]
+                yield microseconds / 1e6, event, values, text
+
+    return settings, records()
+
+
+# Records an interactive session to a compact binary log: the inputs (every timer tick with the simulation
+# steps it ran, key presses and control command batches) and what they changed (face images and cube
+# translations), so SessionReplay can run the same session again, check it ends up the same, and time it.
+class SessionRecorder:
+    def __init__(self, scene, path, settings=None):
+        self.scene = scene
+        self.path = path
+        self.file = open(path, "wb")
+        header = json.dumps(settings or {}).encode()
+        self.file.write(session_log_magic + struct.pack("<I", len(header)) + header)
+        self.start = time.perf_counter()
+        self.last_microseconds = 0
+        self.image_ids = {}  # Image path -> id, each path is written out once
+        self.state = session_state(scene)
+        self.records = 0
+        scene.recorder = self
+
+    # Function to write one record
+    def write(self, event, values=(), text=None):
+        microseconds = int((time.perf_counter() - self.start) * 1e6)
+        delta = min(microseconds - self.last_microseconds, 0xFFFFFFFF)
+        self.last_microseconds = microseconds
+        data = b""
+        if text is not None:
+            data = text.encode()
+            values = tuple(values) + (len(data),)
+        self.file.write(session_record_header.pack(delta, event) + session_payloads[event].pack(*values) + data)
+        self.records += 1
+
+    # Function to record a key press
+    def key(self, key):
+        self.write(session_key, text=key)
+
+    # Function to record a batch of control commands as they are applied
+    def commands(self, batch):
+        self.write(session_commands, text=json.dumps(batch))
+
+    # Function to record that a cube was rebuilt with the images a command gave it, by the command itself or
+    # once the first image had decoded
+    def rebuild(self, cube, with_command):
+        self.write(session_rebuild, (cube, 1 if with_command else 0))
+
+    # Function to record a timer tick and the swaps and moves it led to
+    def tick(self, steps, rendered):
+        self.write(session_tick, (steps, 1 if rendered else 0))
+        for change in session_changes(self.scene, self.state):
+            if change[0] == "swap":
+                _, cube, face, image = change
+                if image not in self.image_ids:
+                    self.image_ids[image] = len(self.image_ids)
+                    self.write(session_image, (self.image_ids[image],), image)
+                self.write(session_swap, (cube, face, self.image_ids[image]))
+            else:
+                self.write(session_move, change[1:])
+
+    # Function to finish the log
+    def close(self):
+        self.file.close()
+        if self.scene.recorder is self:
+            self.scene.recorder = None
+        print(f"Recorded {self.records} events to {self.path}")
 
 
-# Run the render loop
-start_render_loop()
+# Replays a SessionRecorder log: the same ticks, keys and commands go through the same scene code, so two
+# builds can be timed on exactly the same work. Swaps and moves are compared with the recording.
+class SessionReplay:
+    def __init__(self, scene, path):
+        self.scene = scene
+        self.path = path
+        self.settings, self.records = read_session_log(path)
+        self.frame_times = []  # Seconds per tick: the simulation steps plus the render, if it rendered
+        self.mismatches = 0
+        self.first_mismatch = None
+
+    # Function to note a difference between the replay and the recording
+    def mismatch(self, expected, actual):
+        self.mismatches += 1
+        if self.first_mismatch is None:
+            self.first_mismatch = (len(self.frame_times), expected, actual)
+
+    # Function to run the session; "fast" runs the ticks back to back, "realtime" keeps the recorded timing
+    def run(self, pace="fast"):
+        scene = self.scene
+        scene.apply_loaded_textures(wait=True)  # Replays time frames with every texture, not placeholders
+        scene.render_window.Render()  # The first frame, as start_render_loop() draws before the first tick
+        image_names = {}
+        state = session_state(scene)
+        changes = deque()  # What the last tick changed, checked against the records that follow it
+        rebuilds = []  # Cubes the recording rebuilt with new images after the next tick's steps
+        start = time.perf_counter()
+        for seconds, event, values, text in self.records:
+            if pace == "realtime":
+                delay = start + seconds - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            if event == session_tick:
+                while changes:
+                    self.mismatch(None, changes.popleft())
+                steps, rendered = values
+                frame_start = time.perf_counter()
+                if steps:
+                    scene.advance(steps)  # As timer_callback(), which leaves queued face swaps alone without steps
+                if scene.loading_cubes or scene.rebuilding_cubes:
+                    scene.apply_loaded_textures(wait=True, rebuild=[scene.cubes[index] for index in rebuilds])
+                rebuilds.clear()
+                if rendered:
+                    scene.render_window.Render()
+                    if scene.stream_server is not None:
+                        scene.stream_server.publish()
+                self.frame_times.append(time.perf_counter() - frame_start)
+                changes.extend(session_changes(scene, state))
+            elif event == session_key:
+                scene.handle_key(text)
+            elif event == session_commands:
+                for command in json.loads(text):
+                    scene.apply_command(command)
+            elif event == session_image:
+                image_names[values[0]] = text
+            elif event == session_rebuild:
+                cube, with_command = values
+                if with_command:
+                    # The image had decoded by the time of the command, so the cube was rebuilt there and then
+                    scene.apply_loaded_textures(wait=True, rebuild=[scene.cubes[cube]])
+                else:
+                    rebuilds.append(cube)
+            else:
+                if event == session_swap:
+                    expected = ("swap", values[0], values[1], image_names.get(values[2]))
+                else:
+                    expected = ("move",) + tuple(values)
+                actual = changes.popleft() if changes else None
+                if actual != expected:
+                    self.mismatch(expected, actual)
+        while changes:
+            self.mismatch(None, changes.popleft())
+        return self.frame_times
+
+    # Function to print the frame timings and whether the replay matched the recording
+    def report(self):
+        times = sorted(self.frame_times)
+        if not times:
+            print(f"No ticks in {self.path}")
+            return
+        print(f"Replayed {len(times)} ticks in {sum(times):.2f} s of frame time: median "
+              f"{statistics.median(times) * 1000:.2f} ms, "
+              f"95th percentile {times[int(len(times) * 0.95)] * 1000:.2f} ms, max {times[-1] * 1000:.2f} ms")
+        if self.mismatches:
+            frame, expected, actual = self.first_mismatch
+            print(f"The replay differs from the recording in {self.mismatches} changes, first at tick {frame}: "
+                  f"recorded {expected}, replayed {actual}")
+        else:
+            print("The replay matches the recording")
+
+    # Function to return the frame timings as a JSON-ready dict, as compare_replays() takes them
+    def timings(self):
+        return {"log": self.path, "frame_ms": [t * 1000 for t in self.frame_times], "mismatches": self.mismatches}
+
+    # Function to write the frame timings to a JSON file
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.timings(), f)
+        print(f"Wrote frame timings to {path}")
+
+
+# Function to compare two replays of the same log tick by tick (e.g. two builds), returns the median change
+def compare_replays(timings, baseline):
+    new, old = timings["frame_ms"], baseline["frame_ms"]
+    if len(new) != len(old):
+        print(f"The replays have different tick counts ({len(new)} and {len(old)}), were they the same log?")
+    pairs = list(zip(new, old))
+    if not pairs:
+        return 0.0
+    change = statistics.median(new) / max(statistics.median(old), 1e-9) - 1
+    slower = sum(1 for a, b in pairs if a > b * 1.1)
+    faster = sum(1 for a, b in pairs if a < b / 1.1)
+    print(f"Median frame {statistics.median(old):.2f} ms -> {statistics.median(new):.2f} ms ({change:+.1%}), "
+          f"total {sum(old):.0f} ms -> {sum(new):.0f} ms; "
+          f"{slower} ticks more than 10% slower, {faster} more than 10% faster")
+    return change
+
+
+# Tiled rendering of stills larger than any window, e.g. 16384 x 9216 for print. Worker processes each build
+# the scene at the full size, advance it to the same moment and render their share of the tiles, writing
+# them straight into a memory-mapped PPM file, so no process holds more than one tile's pixels.
+tile_worker = None  # In a worker process: scene, NumPy renderer or projection, image size, output path, header size
+
+# Function to create a binary PPM file of width x height for the tiles to be written into, returns the size of
+# its header. The pixels stay a hole in the file until the tiles fill them in.
+def create_ppm(path, width, height):
+    header = f"P6\n{width} {height}\n255\n".encode()
+    with open(path, "wb") as f:
+        f.write(header)
+        f.truncate(len(header) + width * height * 3)
+    return len(header)
+
+# Function to return the projection that draws the tile at (x, y), in pixels from the bottom left, of a
+# width x height image: the whole image's projection, scaled and shifted so the tile fills the window
+def tile_projection(projection, width, height, x, y, tile_width, tile_height):
+    shift = vtkMatrix4x4()
+    shift.SetElement(0, 0, width / tile_width)
+    shift.SetElement(0, 3, (width - 2 * x) / tile_width - 1)
+    shift.SetElement(1, 1, height / tile_height)
+    shift.SetElement(1, 3, (height - 2 * y) / tile_height - 1)
+    matrix = vtkMatrix4x4()
+    vtkMatrix4x4.Multiply4x4(shift, projection, matrix)
+    return matrix
+
+# Function to set up a tile worker process: build the scene at the full image size and advance it as
+# render_headless() would for the given number of seconds. This runs in the first task rather than as the
+# pool's initializer, so a bad setting fails render_tiled() instead of respawning workers forever.
+def start_tile_worker(settings, seconds, fps, backend, path, header_size):
+    global tile_worker
+    scene = build_scene(argparse.Namespace(**settings))
+    if not any(cube.actors for cube in scene.cubes):
+        raise ValueError("No cube faces could be loaded, nothing to render")
+    scene.render_window.SetOffScreenRendering(1)
+    scene.wait_for_video_frames = True
+    ticks_per_frame = 1000 / simulation_step_ms / fps
+    ticks_done = 0
+    for frame in range(int(round(fps * seconds))):
+        steps = round((frame + 1) * ticks_per_frame) - ticks_done
+        scene.advance(steps)
+        ticks_done += steps
+
+    if scene.culler is not None:
+        # Visibility and texture levels as for the whole image, not for each tile
+        scene.culler.update()
+        scene.culler.detach()
+        scene.culler = None
+
+    width, height = scene.render_window.GetSize()
+    projection = None
+    software = None
+    if backend == "numpy":
+        software = SoftwareRenderer(scene)
+    else:
+        # Every tile uses the whole image's near and far planes, so depth is resolved the same way in each
+        scene.renderer.ResetCameraClippingRange()
+        projection = vtkMatrix4x4()
+        projection.DeepCopy(scene.camera.GetProjectionTransformMatrix(width / height, -1, 1))
+        scene.camera.SetUseExplicitProjectionTransformMatrix(True)
+    tile_worker = (scene, software, projection, width, height, path, header_size)
+
+# Function to render one tile (x, y, width, height), in pixels from the top left, in a worker process and
+# write its rows into the output file. The worker is set up from setup (start_tile_worker's arguments) on its
+# first tile. Returns the tile and the seconds spent setting up and rendering.
+def render_tile(setup, tile):
+    setup_seconds = 0.0
+    if tile_worker is None:
+        start = time.perf_counter()
+        start_tile_worker(*setup)
+        setup_seconds = time.perf_counter() - start
+    render_start = time.perf_counter()
+    scene, software, projection, width, height, path, header_size = tile_worker
+    x, y, tile_width, tile_height = tile
+    if software is not None:
+        pixels = memoryview(software.render(tile)).cast("B")
+        top_first = True
+    else:
+        scene.camera.SetExplicitProjectionTransformMatrix(
+            tile_projection(projection, width, height, x, height - y - tile_height, tile_width, tile_height))
+        scene.render_window.SetSize(tile_width, tile_height)
+        scene.render_window.Render()
+        data = vtkUnsignedCharArray()
+        scene.render_window.GetPixelData(0, 0, tile_width - 1, tile_height - 1, 0, data, 0)
+        pixels = memoryview(data).cast("B")
+        top_first = False  # OpenGL reads the bottom row first
+
+    # Map only the rows of the file the tile covers
+    start = header_size + y * width * 3
+    map_start = start - start % mmap.ALLOCATIONGRANULARITY
+    map_end = header_size + (y + tile_height) * width * 3
+    row_bytes = tile_width * 3
+    with open(path, "r+b") as f, mmap.mmap(f.fileno(), map_end - map_start, offset=map_start) as output:
+        for row in range(tile_height):
+            source = (row if top_first else tile_height - 1 - row) * row_bytes
+            offset = start - map_start + (row * width + x) * 3
+            output[offset:offset + row_bytes] = pixels[source:source + row_bytes]
+    return tile, setup_seconds, time.perf_counter() - render_start
+
+# Function to render a width x height still in tiles of at most tile_size pixels square, spread over worker
+# processes, into a PPM file. The scene comes from settings (see scene_settings) and is drawn as it is after
+# the given seconds of animation. Only the NumPy backend makes tiles identical to one whole render, so VTK
+# must be asked for. Returns the seconds it took.
+def render_tiled(settings, path, width, height, tile_size=2048, workers=None, seconds=0.0, fps=30,
+                 backend="numpy"):
+    if backend == "numpy" and numpy is None:
+        raise ImportError("Tiled rendering needs NumPy for exact tiles, or backend=\"vtk\"")
+    elif backend == "vtk":
+        print("Note: VTK tiles can differ from one whole render by a few pixels along face edges, "
+              "the NumPy backend makes them identical")
+    elif backend != "numpy":
+        raise ValueError(f"Unknown render backend: {backend}")
+    settings = dict(scene_settings, **{name: value for name, value in settings.items() if name in scene_settings})
+    settings["width"], settings["height"] = width, height
+    tiles = [(x, y, min(tile_size, width - x), min(tile_size, height - y))
+             for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+    workers = min(workers or os.cpu_count() or 1, len(tiles))
+    header_size = create_ppm(path, width, height)
+
+    setup = (settings, seconds, fps, backend, path, header_size)
+    setup_times, render_time = [], 0.0
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")  # Each worker needs its own GL context, so nothing is forked
+    with context.Pool(workers) as pool:
+        jobs = pool.imap_unordered(render_tile_job, [(setup, tile) for tile in tiles])
+        for done, (_, setup_seconds, render_seconds) in enumerate(jobs, 1):
+            if setup_seconds:
+                setup_times.append(setup_seconds)
+            render_time += render_seconds
+            print(f"Rendered tile {done} of {len(tiles)}", end="\r", flush=True)
+    elapsed = time.perf_counter() - start
+    # Setting up is paid once per worker, the tiles are shared out; the split shows how far more cores help
+    print(f"Rendered {width}x{height} in {len(tiles)} tiles with {workers} processes in {elapsed:.2f} s: {path}")
+    print(f"  worker setup {statistics.mean(setup_times):.2f} s each, tiles {render_time:.2f} s in total "
+          f"({render_time / len(tiles) * 1000:.0f} ms per tile)")
+    return elapsed
+
+# Function to run render_tile() on a (setup, tile) pair, as Pool.imap passes a single argument
+def render_tile_job(job):
+    return render_tile(*job)
+
+
+# Function to build the scene the command line options describe, from an argparse namespace with the
+# options in scene_settings
+def build_scene(args):
+    image_source = ImageDirectory(args.image_dir) if args.image_dir else None
+
+    scene = CubeScene(args.width, args.height, args.background or (0.1, 0.2, 0.4))
+    for i in range(args.grid * args.grid):
+        row, column = divmod(i, args.grid)
+        offset = (args.grid - 1) / 2
+        position = ((column - offset) * 2.0, (row - offset) * 2.0, 0.0)
+        face_schedules = None
+        if args.gallery:
+            # Each face starts at a different point in the list so the cube shows six different images
+            gallery_images = args.images or images_to_cycle
+            face_schedules = []
+            for face_index in range(len(cube_faces)):
+                start = face_index % len(gallery_images)
+                face_schedules.append({"images": gallery_images[start:] + gallery_images[:start],
+                                       "period": args.gallery})
+        scene.add_cube(SpinningCube(args.images, position, use_atlas=args.atlas, image_source=image_source,
+                                    face_schedules=face_schedules, reuse_textures=args.reuse_textures,
+                                    defer_textures=getattr(args, "fast_start", False)))
+
+    for cube in scene.cubes:
+        if args.pivot:
+            cube.set_pivot(*args.pivot)
+        if args.spin:
+            cube.set_angular_velocity(args.spin[:3], args.spin[3])
+    if args.pivot:
+        # Frame the sphere each cube sweeps around its pivot rather than where the cube is right now
+        radius = max(math.dist(args.pivot, (x, y, z)) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5))
+        centers = [[cube.translation[i] + args.pivot[i] for i in range(3)] for cube in scene.cubes]
+        bounds = []
+        for i in range(3):
+            bounds += [min(c[i] for c in centers) - radius, max(c[i] for c in centers) + radius]
+        scene.reset_camera(bounds)
+    else:
+        scene.reset_camera()
+
+    if args.cull:
+        scene.enable_culling()
+
+    if args.video:
+        video = scene.add_video(VideoTexture(args.video, args.video_fps))
+        for cube in scene.cubes:
+            cube.play_video(video)
+    return scene
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spinning textured cube")
+    parser.add_argument("--headless", action="store_true", help="render offscreen and export frames")
+    parser.add_argument("--output", default="frames/frame_%05d.png", help="image sequence pattern")
+    parser.add_argument("--encoder", help="command that reads raw RGB frames on stdin, "
+                                          "e.g. \"ffmpeg -y -f rawvideo -pix_fmt rgb24 -s {width}x{height} "
+                                          "-r {fps} -i - cube.mp4\"")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of animation to render")
+    parser.add_argument("--images", nargs="+", help="images to cycle through instead of the built-in list")
+    parser.add_argument("--image-dir", help="cycle through the images in this directory, picking up new files")
+    parser.add_argument("--background", type=float, nargs=3, metavar=("R", "G", "B"), help="background color (0-1)")
+    parser.add_argument("--grid", type=int, default=1, help="show a grid of N x N cubes")
+    parser.add_argument("--atlas", action="store_true", help="draw each cube as one mesh with a texture atlas")
+    parser.add_argument("--video", metavar="DIR", help="play the image sequence in DIR on every face")
+    parser.add_argument("--video-fps", type=float, default=30, help="frame rate of the --video sequence")
+    parser.add_argument("--gallery", type=float, metavar="SECONDS",
+                        help="give every face its own playlist, swapping one face every SECONDS / 6")
+    parser.add_argument("--reuse-textures", action="store_true",
+                        help="copy new images into each face's existing texture instead of switching textures")
+    parser.add_argument("--cull", action="store_true",
+                        help="hide cubes outside the view and use smaller textures for far away cubes")
+    parser.add_argument("--pivot", type=float, nargs=3, metavar=("X", "Y", "Z"),
+                        help="rotate about this point of the cube, e.g. -0.5 -0.5 -0.5 for a vertex")
+    parser.add_argument("--spin", type=float, nargs=4, metavar=("X", "Y", "Z", "DEG_PER_S"),
+                        help="also spin about the axis (X, Y, Z) at this many degrees per second")
+    parser.add_argument("--control", metavar="ADDRESS",
+                        help="accept JSON-lines commands on HOST:PORT or unix:PATH, e.g. 127.0.0.1:8765")
+    parser.add_argument("--stream", metavar="ADDRESS",
+                        help="serve the frames as MJPEG on HOST:PORT or unix:PATH, e.g. 127.0.0.1:8080")
+    parser.add_argument("--stream-fps", type=float, default=30, help="most frames per second sent to viewers")
+    parser.add_argument("--stream-quality", type=int, default=80, help="JPEG quality of the stream (1-100)")
+    parser.add_argument("--backend", choices=["vtk", "numpy"],
+                        help="headless renderer: VTK's OpenGL, or NumPy on the CPU for machines without a GPU "
+                             "(default vtk, or numpy with --tiled, as only its tiles match one whole render)")
+    parser.add_argument("--record", metavar="LOG",
+                        help="record timer ticks, key presses and control commands to LOG for --replay")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="run a recorded session again with its settings and time every frame "
+                             "(offscreen with --headless)")
+    parser.add_argument("--replay-pace", choices=["fast", "realtime"], default="fast",
+                        help="run the recorded ticks back to back, or at their recorded times")
+    parser.add_argument("--replay-output", help="write the replay's frame timings to this JSON file")
+    parser.add_argument("--replay-baseline", help="compare the replay's frame timings with an earlier --replay-output")
+    parser.add_argument("--tiled", metavar="PPM",
+                        help="render one --width x --height still in tiles across processes to this PPM file, "
+                             "for sizes beyond a window such as 16384 x 9216")
+    parser.add_argument("--tile-size", type=int, default=2048, help="largest width and height of a tile")
+    parser.add_argument("--workers", type=int, help="processes that render tiles (default: one per core)")
+    parser.add_argument("--at", type=float, default=0.0, metavar="SECONDS",
+                        help="moment of the animation the --tiled still shows")
+    parser.add_argument("--fast-start", action="store_true",
+                        help="show the first frame with placeholder colors and put textures on as they decode")
+    parser.add_argument("--startup-only", action="store_true",
+                        help="render until every texture is on screen, print the start-up times as JSON and exit "
+                             "(offscreen with --headless)")
+    parser.add_argument("--profile", action="store_true", help="start with the frame profiler on (toggle with i)")
+    parser.add_argument("--profile-output", help="write the profiled frames to this .csv or .json file on exit")
+    args = parser.parse_args()
+
+    if args.replay:
+        for name, value in read_session_log(args.replay)[0].items():
+            setattr(args, name, value)
+
+    if args.tiled:
+        render_tiled({name: getattr(args, name) for name in scene_settings}, args.tiled, args.width, args.height,
+                     args.tile_size, args.workers, args.at, args.fps, args.backend or "numpy")
+        sys.exit()
+    args.backend = args.backend or "vtk"
+
+    scene = build_scene(args)
+
+    if args.profile:
+        scene.profiler.enable()
+
+    if args.control:
+        ControlServer(scene, args.control).start()
+    if args.stream:
+        StreamServer(scene, args.stream, args.stream_quality, args.stream_fps).start()
+
+    if args.startup_only:
+        scene.render_window.SetOffScreenRendering(1 if args.headless else 0)
+        print(json.dumps(scene.measure_startup()))
+    elif args.replay:
+        scene.render_window.SetOffScreenRendering(1 if args.headless else 0)
+        replay = SessionReplay(scene, args.replay)
+        replay.run(args.replay_pace)
+        replay.report()
+        if args.replay_output:
+            replay.save(args.replay_output)
+        if args.replay_baseline:
+            with open(args.replay_baseline) as f:
+                compare_replays(replay.timings(), json.load(f))
+    elif args.headless:
+        if not any(cube.actors for cube in scene.cubes):
+            sys.exit("No cube faces could be loaded, nothing to render")
+        try:
+            scene.render_headless(args.output, args.fps, args.duration, args.encoder, args.backend)
+        except RuntimeError as error:
+            sys.exit(str(error))
+    else:
+        if args.record:
+            SessionRecorder(scene, args.record, {name: getattr(args, name) for name in scene_settings})
+        # Run the render loop
+        scene.start_render_loop()
+        if scene.recorder is not None:
+            scene.recorder.close()
+
+    if scene.control_server is not None:
+        scene.control_server.close()
+    if scene.stream_server is not None:
+        scene.stream_server.close()
+    if args.profile_output and scene.profiler.frames:
+        scene.profiler.dump(args.profile_output)
 
 
 
@@ -605,134 +3778,134 @@ start_render_loop()
 
 
 #### att 2. - this works with picture replacement for image uploading on to the cube ##
-import os
-import vtk
-import time
-import threading
-
-# Function to create a textured face for a cube
-def create_textured_face(image_path, origin, point1, point2):
-    reader = vtk.vtkJPEGReader()
-    if not os.path.exists(image_path):
-        print(f"Image not found: {image_path}")
-        return None
-
-    reader.SetFileName(image_path)
-
-    texture = vtk.vtkTexture()
-    texture.SetInputConnection(reader.GetOutputPort())
-    texture.InterpolateOn()
-
-    plane = vtk.vtkPlaneSource()
-    plane.SetOrigin(*origin)
-    plane.SetPoint1(*point1)
-    plane.SetPoint2(*point2)
-
-    mapper = vtk.vtkPolyDataMapper()
-    mapper.SetInputConnection(plane.GetOutputPort())
-
-    actor = vtk.vtkActor()
-    actor.SetMapper(mapper)
-    actor.SetTexture(texture)
-
-    return actor
-
-# Define cube face coordinates and initial images (placeholders)
-cube_faces = [
-    {"image": "", "origin": [0, 0, 0.5], "point1": [1, 0, 0.5], "point2": [0, 1, 0.5]},
-    {"image": "", "origin": [1, 0, -0.5], "point1": [0, 0, -0.5], "point2": [1, 1, -0.5]},
-    {"image": "", "origin": [0, 1, -0.5], "point1": [1, 1, -0.5], "point2": [0, 1, 0.5]},
-    {"image": "", "origin": [0, 0, -0.5], "point1": [1, 0, -0.5], "point2": [0, 0, 0.5]},
-    {"image": "", "origin": [0, 0, -0.5], "point1": [0, 1, -0.5], "point2": [0, 0, 0.5]},
-    {"image": "", "origin": [1, 0, 0.5], "point1": [1, 1, 0.5], "point2": [1, 0, -0.5]},
-]
-
-# List of images to cycle through
-images_to_cycle = ["harambee_logo2.jpg", "craig.jpg", "cody.jpg", "jordyn.jpg"]
-current_image_index = 0  # Start with the first image
-
-# Set up the rendering environment
-renderer = vtk.vtkRenderer()
-renderer.SetBackground(0.1, 0.2, 0.4)  # Background color: dark blue
-
-# Create a list of actors for the cube faces
-actors = []
-for face in cube_faces:
-    # Temporarily use the first image
-    face["image"] = images_to_cycle[current_image_index]
-    actor = create_textured_face(face["image"], face["origin"], face["point1"], face["point2"])
-    if actor:
-        actors.append(actor)
-        renderer.AddActor(actor)
-
-render_window = vtk.vtkRenderWindow()
-render_window.AddRenderer(renderer)
-render_window.SetSize(800, 600)
-
-render_window_interactor = vtk.vtkRenderWindowInteractor()
-render_window_interactor.SetRenderWindow(render_window)
-
-# Function to update textures when spacebar is pressed
-def update_textures():
-    global current_image_index
-
-    # Cycle to the next image
-    current_image_index = (current_image_index + 1) % len(images_to_cycle)
-
-    # Update all cube face textures
-    new_image = images_to_cycle[current_image_index]
-    print(f"Updating cube faces to use image: {new_image}")
-
-    for i, face in enumerate(cube_faces):
-        # Update the actor's texture
-        reader = vtk.vtkJPEGReader()
-        if not os.path.exists(new_image):
-            print(f"Image not found: {new_image}")
-            continue
-
-        print(f"Loading image: {new_image}")
-        reader.SetFileName(new_image)
-
-        texture = vtk.vtkTexture()
-        texture.SetInputConnection(reader.GetOutputPort())
-        texture.InterpolateOn()
-        texture.Update()  # Make sure the texture is fully loaded
-
-        # Check if the texture is loaded properly
-        if texture.GetInput() is None:
-            print(f"Texture loading failed for image: {new_image}")
-            continue
-
-        # Set the texture on the actor
-        actors[i].SetTexture(texture)
-
-    # Re-render the scene to apply changes
-    render_window.Render()
-
-# Timer callback function
-def timer_callback(obj, event):
-    update_textures()  # Only update textures when the timer event triggers
-
-# Function to start rendering loop
-def start_render_loop():
-    # Initialize the render window interactor and the render window
-    render_window_interactor.Initialize()
-    render_window.Render()
-
-    # Create a repeating timer for texture updates every 5 seconds (5000 ms)
-    render_window_interactor.CreateRepeatingTimer(5000)  # 5000 ms = 5 seconds
-
-    # Bind the timer callback to the timer event
-    render_window_interactor.AddObserver("TimerEvent", timer_callback)
-
-    # Start the render window interaction loop (this will handle events like mouse and keyboard inputs)
-    render_window_interactor.Start()
-
+# import os
+# import vtk
+# import time
+# import threading
+#
+# # Function to create a textured face for a cube
+# def create_textured_face(image_path, origin, point1, point2):
+#     reader = vtk.vtkJPEGReader()
+#     if not os.path.exists(image_path):
+#         print(f"Image not found: {image_path}")
+#         return None
+#
+#     reader.SetFileName(image_path)
+#
+#     texture = vtk.vtkTexture()
+#     texture.SetInputConnection(reader.GetOutputPort())
+#     texture.InterpolateOn()
+#
+#     plane = vtk.vtkPlaneSource()
+#     plane.SetOrigin(*origin)
+#     plane.SetPoint1(*point1)
+#     plane.SetPoint2(*point2)
+#
+#     mapper = vtk.vtkPolyDataMapper()
+#     mapper.SetInputConnection(plane.GetOutputPort())
+#
+#     actor = vtk.vtkActor()
+#     actor.SetMapper(mapper)
+#     actor.SetTexture(texture)
+#
+#     return actor
+#
+# # Define cube face coordinates and initial images (placeholders)
+# cube_faces = [
+#     {"image": "", "origin": [0, 0, 0.5], "point1": [1, 0, 0.5], "point2": [0, 1, 0.5]},
+#     {"image": "", "origin": [1, 0, -0.5], "point1": [0, 0, -0.5], "point2": [1, 1, -0.5]},
+#     {"image": "", "origin": [0, 1, -0.5], "point1": [1, 1, -0.5], "point2": [0, 1, 0.5]},
+#     {"image": "", "origin": [0, 0, -0.5], "point1": [1, 0, -0.5], "point2": [0, 0, 0.5]},
+#     {"image": "", "origin": [0, 0, -0.5], "point1": [0, 1, -0.5], "point2": [0, 0, 0.5]},
+#     {"image": "", "origin": [1, 0, 0.5], "point1": [1, 1, 0.5], "point2": [1, 0, -0.5]},
+# ]
+#
+# # List of images to cycle through
+# images_to_cycle = ["harambee_logo2.jpg", "craig.jpg", "cody.jpg", "jordyn.jpg"]
+# current_image_index = 0  # Start with the first image
+#
+# # Set up the rendering environment
+# renderer = vtk.vtkRenderer()
+# renderer.SetBackground(0.1, 0.2, 0.4)  # Background color: dark blue
+#
+# # Create a list of actors for the cube faces
+# actors = []
+# for face in cube_faces:
+#     # Temporarily use the first image
+#     face["image"] = images_to_cycle[current_image_index]
+#     actor = create_textured_face(face["image"], face["origin"], face["point1"], face["point2"])
+#     if actor:
+#         actors.append(actor)
+#         renderer.AddActor(actor)
+#
+# render_window = vtk.vtkRenderWindow()
+# render_window.AddRenderer(renderer)
+# render_window.SetSize(800, 600)
+#
+# render_window_interactor = vtk.vtkRenderWindowInteractor()
+# render_window_interactor.SetRenderWindow(render_window)
+#
+# # Function to update textures when spacebar is pressed
+# def update_textures():
+#     global current_image_index
+#
+#     # Cycle to the next image
+#     current_image_index = (current_image_index + 1) % len(images_to_cycle)
+#
+#     # Update all cube face textures
+#     new_image = images_to_cycle[current_image_index]
+#     print(f"Updating cube faces to use image: {new_image}")
+#
+#     for i, face in enumerate(cube_faces):
+#         # Update the actor's texture
+#         reader = vtk.vtkJPEGReader()
+#         if not os.path.exists(new_image):
+#             print(f"Image not found: {new_image}")
+#             continue
+#
+#         print(f"Loading image: {new_image}")
+#         reader.SetFileName(new_image)
+#
+#         texture = vtk.vtkTexture()
+#         texture.SetInputConnection(reader.GetOutputPort())
+#         texture.InterpolateOn()
+#         texture.Update()  # Make sure the texture is fully loaded
+#
+#         # Check if the texture is loaded properly
+#         if texture.GetInput() is None:
+#             print(f"Texture loading failed for image: {new_image}")
+#             continue
+#
+#         # Set the texture on the actor
+#         actors[i].SetTexture(texture)
+#
+#     # Re-render the scene to apply changes
+#     render_window.Render()
+#
+# # Timer callback function
+# def timer_callback(obj, event):
+#     update_textures()  # Only update textures when the timer event triggers
+#
 # # Function to start rendering loop
-
-
-# Run the render loop
-start_render_loop()
+# def start_render_loop():
+#     # Initialize the render window interactor and the render window
+#     render_window_interactor.Initialize()
+#     render_window.Render()
+#
+#     # Create a repeating timer for texture updates every 5 seconds (5000 ms)
+#     render_window_interactor.CreateRepeatingTimer(5000)  # 5000 ms = 5 seconds
+#
+#     # Bind the timer callback to the timer event
+#     render_window_interactor.AddObserver("TimerEvent", timer_callback)
+#
+#     # Start the render window interaction loop (this will handle events like mouse and keyboard inputs)
+#     render_window_interactor.Start()
+#
+# # # Function to start rendering loop
+#
+#
+# # Run the render loop
+# start_render_loop()
 
 
 
@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+import time
+
+from Rotate_shape import CubeScene, ImageDirectory, SpinningCube, cube_faces, images_to_cycle
+
+try:
+    import psutil
+except ImportError:  # Without psutil memory is read from /proc (Linux only)
+    psutil = None
+
+
+# Function to read this process's resident memory in MB (None where it cannot be measured)
+def resident_memory_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# Function to run the swaps of `hours` of gallery time back to back and report how memory moved.
+# Every face has its own playlist and swaps every `period` seconds, and every swap is rendered.
+def soak(images, hours=24.0, period=5.0, reuse_textures=True, samples=50, width=300, height=300):
+    if resident_memory_mb() is None:
+        sys.exit("Cannot measure memory on this platform, install psutil")
+
+    scene = CubeScene(width, height)
+    scene.render_window.SetOffScreenRendering(1)
+    face_schedules = []
+    for face_index in range(len(cube_faces)):
+        start = face_index % len(images)
+        face_schedules.append({"images": images[start:] + images[:start], "period": period})
+    cube = SpinningCube(images, face_schedules=face_schedules, reuse_textures=reuse_textures)
+    if not cube.actors:
+        sys.exit("No cube faces could be loaded")
+    scene.add_cube(cube)
+    scene.render_window.Render()
+
+    # One pass over every image on every face fills the texture cache, memory is measured from there
+    warmup_swaps = len(images) * len(cube_faces)
+    total_swaps = int(hours * 3600 / period) * len(cube_faces)
+    sample_every = max(1, total_swaps // samples)
+    for swap in range(warmup_swaps):
+        cube.swap_face(swap % len(cube_faces))
+        scene.render_window.Render()
+
+    baseline = resident_memory_mb()
+    peak = baseline
+    print(f"{'swaps':>9} {'simulated h':>12} {'RSS MB':>9} {'growth MB':>10}")
+    print(f"{0:>9} {0.0:>12.2f} {baseline:>9.1f} {0.0:>10.1f}")
+
+    start = time.perf_counter()
+    for swap in range(1, total_swaps + 1):
+        cube.swap_face(swap % len(cube_faces))
+        cube.rotate_cube()
+        scene.render_window.Render()
+        if swap % sample_every == 0 or swap == total_swaps:
+            memory = resident_memory_mb()
+            peak = max(peak, memory)
+            simulated_hours = swap / len(cube_faces) * period / 3600
+            print(f"{swap:>9} {simulated_hours:>12.2f} {memory:>9.1f} {memory - baseline:>10.1f}")
+    elapsed = time.perf_counter() - start
+
+    growth = resident_memory_mb() - baseline
+    print(f"{total_swaps} swaps in {elapsed:.1f} s ({total_swaps / elapsed:.0f} swaps/s), "
+          f"RSS {baseline:.1f} MB -> {baseline + growth:.1f} MB (peak {peak:.1f} MB)")
+    return growth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that texture swaps do not grow memory over a long run")
+    parser.add_argument("--images", nargs="+", help="images to show instead of the built-in list")
+    parser.add_argument("--image-dir", help="use the images in this directory")
+    parser.add_argument("--hours", type=float, default=24.0, help="hours of gallery time to simulate")
+    parser.add_argument("--period", type=float, default=5.0, help="seconds between swaps of each face")
+    parser.add_argument("--switch-textures", action="store_true",
+                        help="switch between cached textures instead of reusing each face's texture")
+    parser.add_argument("--max-growth", type=float, default=16.0, help="MB of growth after warm-up that fails the run")
+    args = parser.parse_args()
+
+    images = ImageDirectory(args.image_dir).images if args.image_dir else args.images or images_to_cycle
+    growth = soak(images, args.hours, args.period, reuse_textures=not args.switch_textures)
+    if growth > args.max_growth:
+        sys.exit(f"Memory grew by {growth:.1f} MB, more than {args.max_growth} MB")
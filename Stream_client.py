@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import sys
+import time
+
+from Rotate_shape import CubeScene, SpinningCube, StreamServer
+
+
+# Function to open an HTTP connection to a stream server at "HOST:PORT" or "unix:PATH"
+async def open_stream(address, path="/stream"):
+    if address.startswith("unix:"):
+        reader, writer = await asyncio.open_unix_connection(address[5:])
+    else:
+        host, port = address.rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: cube\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")  # Status line and headers
+    return reader, writer
+
+# Function to read JPEG frames from an MJPEG stream for some seconds; a delay between frames makes a slow viewer
+async def watch(address, seconds, delay=0.0):
+    reader, writer = await open_stream(address)
+    frames = 0
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            # Each part: boundary and headers, then Content-Length bytes of JPEG and a line break
+            headers = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                             timeout=max(deadline - time.perf_counter(), 0.01))
+            length = int(headers.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            frame = await reader.readexactly(length + 2)
+            if frame[:2] != b"\xff\xd8":
+                raise ValueError("Stream part is not a JPEG")
+            frames += 1
+            if delay:
+                await asyncio.sleep(delay)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+        pass  # Time is up, or the server went away
+    finally:
+        writer.close()
+    return frames
+
+# Function to run many viewers in this process and put (normal frame counts, slow frame counts) on a queue
+def run_viewers(address, count, slow, seconds, results):
+    async def main():
+        tasks = [watch(address, seconds, delay=0.5 if i < slow else 0.0) for i in range(count)]
+        return await asyncio.gather(*tasks)
+    frames = asyncio.run(main())
+    results.put((frames[slow:], frames[:slow]))
+
+# Function to render an offscreen scene as fast as possible for some seconds.
+# Returns frames per second and the render thread's CPU time per frame in ms.
+def render_for(scene, seconds):
+    frames = 0
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    while time.perf_counter() - start < seconds:
+        scene.advance(1)
+        scene.render_window.Render()
+        scene.stream_server.publish()
+        frames += 1
+    return frames / (time.perf_counter() - start), (time.thread_time() - start_cpu) / frames * 1000
+
+# Function to compare the render rate with 1 viewer and with many viewers (some of them slow).
+# The viewers run in another process so they do not share this one's interpreter lock. Where that process
+# has to share the render thread's core, frames per second drop by the CPU the viewers themselves use, so
+# the render thread's CPU time per frame is what shows whether serving them slows rendering down.
+def load_test(viewers=100, slow=10, seconds=10.0, width=320, height=240, max_fps=30, images=None):
+    scene = CubeScene(width, height)
+    scene.render_window.SetOffScreenRendering(1)
+    cube = scene.add_cube(SpinningCube(images))
+    if not cube.actors:
+        sys.exit("No cube faces could be loaded")  # Streaming an empty scene would pass any load test
+    server = StreamServer(scene, "127.0.0.1:0", max_fps=max_fps).start()
+    scene.render_window.Render()
+
+    rates = {"no viewers": render_for(scene, seconds)}
+    print(f"no viewers: rendered {rates['no viewers'][0]:.1f} frames/s, {rates['no viewers'][1]:.2f} ms CPU per frame")
+    for label, count, slow_count in [("1 viewer", 1, 0), (f"{viewers} viewers", viewers, slow)]:
+        context = multiprocessing.get_context("spawn")  # Do not fork the GL context and server threads
+        results = context.Queue()
+        process = context.Process(target=run_viewers,
+                                  args=(server.bound_address, count, slow_count, seconds + 1, results))
+        process.start()
+        while len(server.viewers) < count and process.is_alive():
+            scene.render_window.Render()
+            server.publish()
+        encoded = server.frames_encoded
+        rates[label] = render_for(scene, seconds)
+        sent = server.frames_encoded - encoded
+        normal, slow_frames = results.get()
+        process.join()
+        print(f"{label}: rendered {rates[label][0]:.1f} frames/s, {rates[label][1]:.2f} ms CPU per frame, "
+              f"streamed {sent / seconds:.1f} frames/s; viewers got median {statistics.median(normal) / seconds:.1f} frames/s (min {min(normal) / seconds:.1f})"
+              + (f", slow viewers {statistics.median(slow_frames) / seconds:.1f} frames/s" if slow_frames else ""))
+    server.close()
+    return rates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch or load-test a cube MJPEG stream")
+    parser.add_argument("address", nargs="?", default="127.0.0.1:8080", help="HOST:PORT or unix:PATH")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long to watch or to run each load step")
+    parser.add_argument("--load", type=int, metavar="N",
+                        help="check the render rate of an in-process scene with N viewers")
+    parser.add_argument("--slow", type=int, default=10, help="viewers in the load test that read slowly")
+    parser.add_argument("--images", nargs="+", help="images to show in the load test instead of the built-in list")
+    parser.add_argument("--max-slowdown", type=float, default=0.1,
+                        help="fraction the render thread's CPU time per frame may grow from 1 viewer to N viewers")
+    args = parser.parse_args()
+
+    if args.load:
+        rates = load_test(args.load, args.slow, args.seconds, images=args.images)
+        slowdown = rates[f"{args.load} viewers"][1] / rates["1 viewer"][1] - 1
+        if slowdown > args.max_slowdown:
+            sys.exit(f"Frames took {slowdown:.0%} more render thread time with {args.load} viewers")
+    else:
+        frames = asyncio.run(watch(args.address, args.seconds))
+        print(f"Received {frames} frames in {args.seconds:.0f} s ({frames / args.seconds:.1f} frames/s)")